@@ -1,41 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from .database import get_db
+from starlette.concurrency import run_in_threadpool
+from .cache import TTLCache, redis_call
+from .config import get_settings
+from .database import get_request_db, run_db
 from .models import User
 from .schemas import TokenData
+import asyncio
+import hashlib
+import json
 import os
+import time
+
+settings = get_settings()
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt runs on a small dedicated pool and is awaited, so a login storm
+# neither blocks the event loop nor ties up the shared threadpool that sync
+# handlers run on; work beyond the queue limit is shed with a 503
+password_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_password_counters = {"in_flight": 0, "completed": 0, "rejected": 0}  # only touched on the event loop
+
+async def _run_password_task(func, *args):
+    if _password_counters["in_flight"] >= settings.password_hash_workers + settings.password_hash_queue_limit:
+        _password_counters["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    _password_counters["in_flight"] += 1
+    try:
+        result = await asyncio.wrap_future(password_executor.submit(func, *args))
+        _password_counters["completed"] += 1
+        return result
+    finally:
+        _password_counters["in_flight"] -= 1
+
+def get_password_pool_stats() -> Dict[str, int]:
+    """bcrypt pool size, current load and shed requests"""
+    return {
+        "workers": settings.password_hash_workers,
+        "queue_limit": settings.password_hash_queue_limit,
+        **_password_counters
+    }
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await _run_password_task(pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return await _run_password_task(pwd_context.hash, password)
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get user by email"""
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """Authenticate user with email and password"""
-    user = get_user_by_email(db, email)
+def create_user(db: Session, email: str, hashed_password: str, role: str) -> User:
+    """Insert a new user"""
+    user = User(email=email, hashed_password=hashed_password, role=role)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+# Authenticated users by email (the JWT subject); a local LRU tier in front
+# of an optional Redis tier shared between workers
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+USER_CACHE_FIELDS = ("id", "email", "role", "is_active", "created_at")
+
+def _redis_user_key(email: str) -> str:
+    return f"mx70:user:{email}"
+
+def _user_to_dict(user: User) -> Dict[str, Any]:
+    return {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+
+def _read_shared_user(email: str) -> Optional[Dict[str, Any]]:
+    raw = redis_call("get", _redis_user_key(email))
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    if data["created_at"]:
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return data
+
+def _write_shared_user(data: Dict[str, Any]):
+    payload = {**data, "created_at": data["created_at"].isoformat() if data["created_at"] else None}
+    redis_call("set", _redis_user_key(data["email"]), json.dumps(payload), ex=settings.user_cache_ttl)
+
+async def get_cached_user(email: str) -> Optional[User]:
+    """Return a detached User from the cache, or None on a miss"""
+    data = user_cache.get(email)
+    if data is None and settings.user_cache_redis:
+        data = await run_in_threadpool(_read_shared_user, email)
+        if data is not None:
+            user_cache.set(email, data)
+    return User(**data) if data is not None else None
+
+async def cache_user(user: User):
+    """Store a user in the cache tiers"""
+    data = _user_to_dict(user)
+    user_cache.set(user.email, data)
+    if settings.user_cache_redis:
+        await run_in_threadpool(_write_shared_user, data)
+
+def invalidate_cached_user(email: str):
+    """Drop a user from the cache tiers, e.g. after deactivation or a role change"""
+    user_cache.delete(email)
+    if settings.user_cache_redis:
+        redis_call("delete", _redis_user_key(email))
+
+# Changed users are collected during the transaction and dropped from the
+# cache only after it commits, so a concurrent request can't re-cache the
+# old row between the flush and the commit
+def _users_to_invalidate(session: Session) -> set:
+    return session.info.setdefault("invalidate_user_emails", set())
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        _users_to_invalidate(session).add(target.email)
+
+@event.listens_for(User.email, "set", active_history=True)
+def _collect_old_email(target, value, oldvalue, initiator):
+    # The cache is keyed by email, so an email change must drop the old key
+    session = Session.object_session(target)
+    if session is not None and isinstance(oldvalue, str) and oldvalue != value:
+        _users_to_invalidate(session).add(oldvalue)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    """Collect the users matched by bulk update()/delete() statements on User"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not User:
+        return
+    
+    query = select(User.email)
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, list):
+        # Bulk UPDATE by primary key: update(User), [{"id": ..., ...}, ...]
+        query = query.where(User.id.in_([row["id"] for row in parameters if "id" in row]))
+    elif orm_execute_state.statement.whereclause is not None:
+        query = query.where(orm_execute_state.statement.whereclause)
+    session = orm_execute_state.session
+    _users_to_invalidate(session).update(session.execute(query).scalars())
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users_on_commit(session):
+    for email in session.info.pop("invalidate_user_emails", ()):
+        invalidate_cached_user(email)
+
+@event.listens_for(Session, "after_rollback")
+def _clear_users_to_invalidate(session):
+    session.info.pop("invalidate_user_emails", None)
+
+async def authenticate_user(db, email: str, password: str) -> Optional[User]:
+    """Authenticate user with email and password (sync or async session)"""
+    user = await run_db(db, get_user_by_email, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return None
     return user
 
@@ -50,7 +193,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Verified token payloads by SHA-256 digest, kept no longer than the token's exp
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Verify and decode a JWT, skipping verification for recently seen tokens"""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        ttl = exp - time.time() if exp is not None else None
+        if ttl is None or ttl > 0:
+            token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_request_db)):
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,16 +216,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(db, email=token_data.email)
+    user = await get_cached_user(token_data.email)
     if user is None:
-        raise credentials_exception
+        user = await run_db(db, get_user_by_email, token_data.email)
+        if user is None:
+            raise credentials_exception
+        await cache_user(user)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
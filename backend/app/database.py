@@ -1,29 +1,115 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any
 from dotenv import load_dotenv
+from .config import get_settings
 
 load_dotenv()
 
+settings = get_settings()
+
 # Database URL - defaults to SQLite for local development
-DATABASE_URL = os.getenv(
-    "DATABASE_URL", 
-    "sqlite:///./mx70_dev.db"
-)
-
-# Create engine with proper settings for SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False},
-        echo=True  # Enable SQL logging for development
-    )
-else:
-    engine = create_engine(DATABASE_URL, echo=True)
+DATABASE_URL = settings.database_url
+
+# Pool activity counters per engine ("sync" / "async"), exposed through get_pool_stats()
+_pool_counters: Dict[str, Dict[str, int]] = {}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite for concurrent development use"""
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal and ":memory:" not in DATABASE_URL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.close()
+
+def build_engine(url: str):
+    """Create the engine with pool and logging settings from config"""
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            echo=settings.db_echo
+        )
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    else:
+        connect_args = {}
+        if settings.db_statement_timeout_ms and url.startswith("postgresql"):
+            connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+        engine = create_engine(
+            url,
+            echo=settings.db_echo,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            connect_args=connect_args
+        )
+    
+    _count_pool_activity(engine, "sync")
+    return engine
+
+def _count_pool_activity(engine, name: str):
+    """Keep connect/checkout/checkin counters for an engine's pool"""
+    counters = _pool_counters[name] = {"connections_opened": 0, "checkouts": 0, "checkins": 0}
+    
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        counters["connections_opened"] += 1
+    
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+    
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        counters["checkins"] += 1
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+def build_async_engine(url: str):
+    """Create the asyncio engine with the same settings as build_engine"""
+    async_url = to_async_url(url)
+    if url.startswith("sqlite"):
+        async_engine = create_async_engine(async_url, echo=settings.db_echo)
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    else:
+        connect_args = {}
+        if settings.db_statement_timeout_ms and url.startswith("postgresql"):
+            connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+        async_engine = create_async_engine(
+            async_url,
+            echo=settings.db_echo,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            connect_args=connect_args
+        )
+    
+    _count_pool_activity(async_engine.sync_engine, "async")
+    return async_engine
+
+engine = build_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional asyncio engine, used by async handlers when DB_ASYNC is enabled
+async_engine = build_async_engine(DATABASE_URL) if settings.db_async else None
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False) if async_engine else None
+
 Base = declarative_base()
 
 def get_db():
@@ -32,4 +118,44 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Dependency to get an asyncio database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency for async handlers: an AsyncSession when DB_ASYNC is
+# enabled, otherwise the regular sync session
+get_request_db = get_async_db if settings.db_async else get_db
+
+async def run_db(db, func, *args):
+    """Run a function taking a sync Session without blocking the event loop
+    
+    With an AsyncSession the function runs through run_sync on the async
+    connection; with a sync Session it runs in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(func, *args)
+    return await run_in_threadpool(func, db, *args)
+
+def _pool_stats(engine, name: str) -> Dict[str, Any]:
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__, "status": pool.status(), **_pool_counters[name]}
+    if hasattr(pool, "checkedout"):
+        capacity = pool.size() + max(settings.db_max_overflow, 0)
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "saturation": pool.checkedout() / capacity if capacity else 0.0
+        })
+    return stats
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool occupancy and activity counters for the sync and async engines"""
+    stats = {"sync": _pool_stats(engine, "sync")}
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.sync_engine, "async")
+    return stats
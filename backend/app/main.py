@@ -1,41 +1,59 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.staticfiles import StaticFiles
 from datetime import timedelta
+from typing import Optional
+import hmac
+import os
 
-from .database import engine, get_db
-from .models import Base, User
+from .database import get_pool_stats, get_request_db, run_db
+from .models import User
 from .schemas import UserCreate, UserResponse, Token
 from .auth import (
     get_password_hash, 
+    get_user_by_email, 
+    create_user, 
     authenticate_user, 
     create_access_token, 
     get_current_active_user,
+    get_password_pool_stats,
+    token_cache,
+    user_cache,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from .routers import gigs, lessons, payments, dashboard
-from .middleware import setup_rate_limiting
+from .middleware import limiter, setup_rate_limiting, setup_upload_limits
+from .services.email import email_dispatcher
+from .services.credit_expiry import credit_expiry_sweeper
+from .services.webhooks import webhook_dispatcher
 from .config import get_settings
 
 settings = get_settings()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="MX70 API", description="Performance-based micro-influencer marketplace", version="1.0.0")
 
-# CORS middleware for frontend integration
+# Setup rate limiting
+setup_rate_limiting(app)
+
+# Reject oversized uploads while they stream in
+setup_upload_limits(app)
+
+# CORS middleware for frontend integration; added last so it wraps the
+# limits above and their 429/413 responses carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:5173"],  # React dev servers
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Setup rate limiting
-setup_rate_limiting(app)
+# Serve uploaded files when using local storage
+if settings.storage_backend == "local":
+    os.makedirs(settings.local_storage_dir, exist_ok=True)
+    app.mount("/uploads", StaticFiles(directory=settings.local_storage_dir), name="uploads")
 
 # Include routers
 app.include_router(gigs.router)
@@ -43,16 +61,57 @@ app.include_router(lessons.router)
 app.include_router(payments.router)
 app.include_router(dashboard.router)
 
+@app.on_event("startup")
+async def start_background_services():
+    """Start in-process background workers"""
+    email_dispatcher.start()
+    credit_expiry_sweeper.start()
+    limiter.start()
+    await webhook_dispatcher.recover()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    """Drain and stop in-process background workers"""
+    await credit_expiry_sweeper.stop()
+    await limiter.stop()
+    await webhook_dispatcher.stop()
+    await email_dispatcher.stop()
+
 @app.get("/")
 def read_root():
     """Health check endpoint"""
     return {"message": "MX70 API is running!"}
 
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Allow /metrics only with the configured METRICS_TOKEN (disabled when unset)"""
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(authorization or "", f"Bearer {settings.metrics_token}"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+def read_metrics():
+    """Runtime metrics for capacity tuning (internal; requires METRICS_TOKEN)"""
+    return {
+        "db_pool": get_pool_stats(),
+        "email_queue": email_dispatcher.stats(),
+        "credit_expiry": credit_expiry_sweeper.stats(),
+        "webhooks": webhook_dispatcher.stats(),
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hashing": get_password_pool_stats(),
+        "rate_limiter": limiter.stats()
+    }
+
 @app.post("/signup", response_model=UserResponse)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db=Depends(get_request_db)):
     """Register a new user"""
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await run_db(db, get_user_by_email, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -67,22 +126,13 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
-        role=user.role
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
+    hashed_password = await get_password_hash(user.password)
+    return await run_db(db, create_user, user.email, hashed_password, user.role)
 
 @app.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_request_db)):
     """Login endpoint to get access token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
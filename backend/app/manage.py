@@ -0,0 +1,197 @@
+"""Maintenance commands: python -m app.manage <command>"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import urllib.request
+
+from sqlalchemy import inspect
+
+from .database import SessionLocal, engine
+from .services.bonus import recompute_submission_bonuses
+from .services.lesson_catalog import seed_lessons as seed_sample_lessons
+from .services.rollups import rebuild_rollups as rebuild_all_rollups
+from .services.credit_expiry import expire_credits as expire_due_credits
+from .services.payouts import run_payouts as run_payout_batch
+from .services.webhooks import fake_event, replay_events, sign_payload
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Schema that create_all in main.py produced before migrations were added
+BASELINE_REVISION = "0001"
+
+def alembic_config():
+    from alembic.config import Config
+    return Config(ALEMBIC_INI)
+
+def init_db(args):
+    """Create or upgrade the database schema to the latest migration (run before starting the API)"""
+    from alembic import command
+    config = alembic_config()
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        # Created by main.py's create_all before migrations existed; upgrade from the baseline
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, args.revision)
+    print(f"Database schema at revision {args.revision}")
+
+def seed_lessons(args):
+    """Insert the sample lessons into an empty lessons table"""
+    db = SessionLocal()
+    try:
+        added = seed_sample_lessons(db)
+        print(f"Seeded {added} lessons" if added else "Lessons already present")
+    finally:
+        db.close()
+
+def check_import_time(args):
+    """Import app.main in a fresh interpreter and fail if it exceeds the budget"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+    
+    # Lines look like "import time: <self us> | <cumulative us> | <indented module>"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        timings.append((int(self_us), int(cumulative_us), module.strip()))
+    total_ms = next(cumulative for _, cumulative, module in timings if module == "app.main") / 1000
+    
+    print(f"import app.main: {total_ms:.0f}ms (budget {args.budget_ms}ms)")
+    for self_us, cumulative_us, module in sorted(timings, key=lambda t: t[0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms self {cumulative_us / 1000:8.1f}ms total  {module}")
+    if total_ms > args.budget_ms:
+        sys.exit(f"Import time {total_ms:.0f}ms exceeds the {args.budget_ms}ms budget")
+
+def recompute_bonuses(args):
+    """Recompute the stored bonus of every submission"""
+    db = SessionLocal()
+    try:
+        updated = recompute_submission_bonuses(db, batch_size=args.batch_size)
+        print(f"Recomputed bonuses for {updated} submissions")
+    finally:
+        db.close()
+
+def rebuild_rollups(args):
+    """Recompute balance and analytics rollups from the source tables"""
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_all_rollups(db, args.user_id or None)
+        print(f"Rebuilt rollups for {rebuilt} users")
+    finally:
+        db.close()
+
+def expire_credits(args):
+    """Mark every credit past its expiry as expired"""
+    db = SessionLocal()
+    try:
+        result = expire_due_credits(db, batch_size=args.batch_size)
+        print(f"Expired {result['credits_expired']} credits (${result['amount_expired']:.2f}) in {result['batches']} batches")
+    finally:
+        db.close()
+
+def run_payouts(args):
+    """Pay out approved, unpaid submissions (platform-wide or for one business)"""
+    db = SessionLocal()
+    try:
+        result = run_payout_batch(db, business_id=args.business_id, concurrency=args.concurrency)
+        print(f"Processed {result['processed']} payouts: {result['succeeded']} succeeded "
+              f"(${result['total_amount']:.2f}), {result['failed']} failed, "
+              f"{result['pending']} pending retry")
+    finally:
+        db.close()
+
+def replay_webhooks(args):
+    """Re-run stored webhook events (pending and failed ones by default)"""
+    db = SessionLocal()
+    try:
+        counts = replay_events(db, event_ids=args.event_id, statuses=args.status or ["pending", "failed"], limit=args.limit)
+        print(f"Replayed {counts['processed'] + counts['failed']} events: "
+              f"{counts['processed']} processed, {counts['failed']} failed, "
+              f"{counts['skipped']} skipped (claimed elsewhere or waiting on an earlier event)")
+    finally:
+        db.close()
+
+def fake_webhooks(args):
+    """Post signed, Stripe-shaped fake events to a running API (signed with STRIPE_WEBHOOK_SECRET)"""
+    types = args.type or ["payment_intent.succeeded", "payout.paid"]
+    objects = [None] * args.objects
+    sent = []
+    for _ in range(args.count):
+        slot = random.randrange(args.objects)
+        if sent and random.random() < args.duplicate_rate:
+            event = random.choice(sent)  # simulate a Stripe retry
+        else:
+            event = fake_event(random.choice(types), objects[slot])
+            objects[slot] = event["data"]["object"]["id"]
+            sent.append(event)
+        body = json.dumps(event).encode()
+        request = urllib.request.Request(
+            args.url,
+            data=body,
+            headers={"Content-Type": "application/json", "Stripe-Signature": sign_payload(body)}
+        )
+        with urllib.request.urlopen(request) as response:
+            print(event["id"], event["type"], json.loads(response.read())["status"])
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="MX70 maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    command = commands.add_parser("init-db", help=init_db.__doc__)
+    command.add_argument("--revision", default="head", help="migrate to this revision instead of the latest")
+    command.set_defaults(func=init_db)
+    
+    command = commands.add_parser("seed-lessons", help=seed_lessons.__doc__)
+    command.set_defaults(func=seed_lessons)
+    
+    command = commands.add_parser("check-import-time", help=check_import_time.__doc__)
+    command.add_argument("--budget-ms", type=int, default=2000)
+    command.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    command.set_defaults(func=check_import_time)
+    
+    command = commands.add_parser("recompute-bonuses", help=recompute_bonuses.__doc__)
+    command.add_argument("--batch-size", type=int, default=5000)
+    command.set_defaults(func=recompute_bonuses)
+    
+    command = commands.add_parser("rebuild-rollups", help=rebuild_rollups.__doc__)
+    command.add_argument("--user-id", type=int, action="append", help="only rebuild these users")
+    command.set_defaults(func=rebuild_rollups)
+    
+    command = commands.add_parser("expire-credits", help=expire_credits.__doc__)
+    command.add_argument("--batch-size", type=int, default=1000)
+    command.set_defaults(func=expire_credits)
+    
+    command = commands.add_parser("run-payouts", help=run_payouts.__doc__)
+    command.add_argument("--business-id", type=int)
+    command.add_argument("--concurrency", type=int)
+    command.set_defaults(func=run_payouts)
+    
+    command = commands.add_parser("replay-webhooks", help=replay_webhooks.__doc__)
+    command.add_argument("--event-id", action="append", help="replay these events regardless of status")
+    command.add_argument("--status", action="append", choices=["pending", "processed", "failed"])
+    command.add_argument("--limit", type=int)
+    command.set_defaults(func=replay_webhooks)
+    
+    command = commands.add_parser("fake-webhooks", help=fake_webhooks.__doc__)
+    command.add_argument("--url", default="http://localhost:8000/payments/webhook")
+    command.add_argument("--count", type=int, default=20)
+    command.add_argument("--objects", type=int, default=5, help="distinct Stripe objects the events refer to")
+    command.add_argument("--type", action="append", help="event types to generate")
+    command.add_argument("--duplicate-rate", type=float, default=0.2)
+    command.set_defaults(func=fake_webhooks)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
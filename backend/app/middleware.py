@@ -1,27 +1,308 @@
-from fastapi import Request, HTTPException
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-import redis
+import asyncio
+import ipaddress
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from .cache import get_redis_client
 from .config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-# Initialize Redis for rate limiting
-try:
-    redis_client = redis.from_url(settings.redis_url)
-    redis_client.ping()  # Test connection
-except:
-    # Fallback to in-memory for development
-    redis_client = None
-
-limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri=settings.redis_url if redis_client else "memory://",
-    default_limits=["100/minute"]
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str
+    limit: int
+    period: int  # seconds
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "RateLimitRule":
+        """Parse a limit such as "100/minute" """
+        count, unit = spec.split("/")
+        return cls(name, int(count), PERIODS[unit.strip().rstrip("s")])
+
+class TokenBucket:
+    """Local token bucket for one (rule, client) pair"""
+    __slots__ = ("tokens", "updated", "pending", "blocked_until")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.pending = 0  # hits not yet synced to Redis
+        self.blocked_until = 0.0
+
+class RateLimiter:
+    """Two-tier rate limiter
+
+    Every check is answered from an in-process token bucket. A background
+    sync periodically pushes the hits counted since the last sync to Redis
+    in one pipeline (a fixed-window counter per rule and client) and pulls
+    back the cluster-wide totals, which cap the local buckets. Without
+    Redis the local buckets still enforce the limits per process. Either
+    way the sync drops buckets that have been idle long enough to be full.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str, RateLimitRule]], default: RateLimitRule, use_redis: bool = True, sync_interval: float = 1.0):
+        self.rules = rules  # (method or "*", path prefix, rule), first match wins
+        self.default = default
+        self.use_redis = use_redis
+        self.sync_interval = sync_interval
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._rules_by_name = {rule.name: rule for _, _, rule in rules}
+        self._rules_by_name[default.name] = default
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._redis_ok = True
+        self._counters = {
+            "checks": 0,
+            "rejected": 0,
+            "check_seconds_total": 0.0,
+            "check_seconds_max": 0.0,
+            "syncs": 0,
+            "sync_seconds_last": 0.0,
+            "evicted": 0,
+            "redis_errors": 0
+        }
+
+    def rule_for(self, method: str, path: str) -> RateLimitRule:
+        for rule_method, prefix, rule in self.rules:
+            if (rule_method == "*" or rule_method == method) and path.startswith(prefix):
+                return rule
+        return self.default
+
+    def hit(self, rule: RateLimitRule, key: str) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until retry)"""
+        now = time.monotonic()
+        rate = rule.limit / rule.period
+        with self._lock:
+            bucket = self._buckets.get((rule.name, key))
+            if bucket is None:
+                bucket = self._buckets[(rule.name, key)] = TokenBucket(rule.limit, now)
+            else:
+                bucket.tokens = min(rule.limit, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+
+            if bucket.blocked_until > now:
+                return False, bucket.blocked_until - now
+            if bucket.tokens < 1:
+                return False, (1 - bucket.tokens) / rate
+            bucket.tokens -= 1
+            bucket.pending += 1
+            return True, 0.0
+
+    def record_check(self, seconds: float, allowed: bool):
+        self._counters["checks"] += 1
+        self._counters["check_seconds_total"] += seconds
+        self._counters["check_seconds_max"] = max(self._counters["check_seconds_max"], seconds)
+        if not allowed:
+            self._counters["rejected"] += 1
+
+    def sync(self):
+        """Evict idle buckets, then push pending hits to Redis in one pipeline and apply the cluster-wide totals"""
+        started = time.monotonic()
+        with self._lock:
+            pending = []
+            for (name, key), bucket in list(self._buckets.items()):
+                if bucket.pending:
+                    if self.use_redis:
+                        pending.append((name, key, bucket.pending))
+                    bucket.pending = 0
+                elif bucket.updated < started - self._rules_by_name[name].period:
+                    # Idle long enough to be full again
+                    del self._buckets[(name, key)]
+                    self._counters["evicted"] += 1
+
+        if not pending:
+            return
+
+        import redis
+        wall = time.time()
+        pipe = get_redis_client().pipeline(transaction=False)
+        windows = []
+        for name, key, hits in pending:
+            rule = self._rules_by_name[name]
+            window = int(wall // rule.period)
+            redis_key = f"ratelimit:{name}:{key}:{window}"
+            pipe.incrby(redis_key, hits)
+            pipe.expire(redis_key, rule.period * 2)
+            windows.append((window + 1) * rule.period - wall)
+        try:
+            results = pipe.execute()
+        except redis.RedisError as e:
+            if self._redis_ok:
+                logger.warning("Rate limiter: Redis sync failed, enforcing local limits only: %s", e)
+            self._counters["redis_errors"] += 1
+            self._redis_ok = False
+            return
+        self._redis_ok = True
+
+        now = time.monotonic()
+        with self._lock:
+            for (name, key, _), total, window_left in zip(pending, results[::2], windows):
+                bucket = self._buckets.get((name, key))
+                if bucket is None:
+                    continue
+                remaining = self._rules_by_name[name].limit - total
+                if remaining <= 0:
+                    bucket.tokens = 0
+                    bucket.blocked_until = now + window_left
+                else:
+                    bucket.tokens = min(bucket.tokens, remaining)
+
+        self._counters["syncs"] += 1
+        self._counters["sync_seconds_last"] = round(time.monotonic() - started, 6)
+
+    def start(self):
+        """Start the periodic sync on the running event loop (with or without Redis)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop syncing, pushing the last pending hits first"""
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.to_thread(self.sync)
+
+    def stats(self) -> Dict[str, float]:
+        """Check latency, rejections and sync counters"""
+        checks = self._counters["checks"]
+        return {
+            **self._counters,
+            "check_seconds_avg": self._counters["check_seconds_total"] / checks if checks else 0.0,
+            "buckets": len(self._buckets),
+            "redis": self.use_redis
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception:
+                logger.exception("Rate limiter sync failed")
+
+limiter = RateLimiter(
+    rules=[
+        ("POST", "/token", RateLimitRule.parse("login", settings.rate_limit_login)),
+        ("POST", "/signup", RateLimitRule.parse("signup", settings.rate_limit_login)),
+        ("POST", "/gigs/upload-", RateLimitRule.parse("uploads", settings.rate_limit_uploads)),
+        ("POST", "/payments/webhook", RateLimitRule.parse("webhooks", settings.rate_limit_webhooks)),
+    ],
+    default=RateLimitRule.parse("default", settings.rate_limit_default),
+    use_redis=settings.rate_limit_redis,
+    sync_interval=settings.rate_limit_sync_interval
 )
 
+trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.trusted_proxies]
+
+def _is_trusted(address: str, proxies: Sequence) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+def client_ip(request: Request, proxies: Sequence = ()) -> str:
+    """The client's address, following X-Forwarded-For only through trusted proxies
+    
+    Entries are read right to left (each proxy appends the address it saw),
+    and the first one not belonging to a trusted proxy is the client.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted(peer, proxies):
+        return peer
+    forwarded = [
+        address.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for address in header.split(",")
+        if address.strip()
+    ]
+    for address in reversed(forwarded):
+        if not _is_trusted(address, proxies):
+            return address
+    return forwarded[0] if forwarded else peer
+
 def setup_rate_limiting(app):
     """Setup rate limiting for the FastAPI app"""
     app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler) 
\ No newline at end of file
+
+    @app.middleware("http")
+    async def rate_limit(request: Request, call_next):
+        rule = limiter.rule_for(request.method, request.url.path)
+        key = client_ip(request, trusted_proxies)
+
+        started = time.perf_counter()
+        allowed, retry_after = limiter.hit(rule, key)
+        limiter.record_check(time.perf_counter() - started, allowed)
+
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                content={"error": f"Rate limit exceeded: {rule.limit} per {rule.period} seconds"},
+                headers={"Retry-After": str(max(1, round(retry_after))), "X-RateLimit-Limit": str(rule.limit)}
+            )
+        return await call_next(request)
+
+class UploadSizeLimitMiddleware:
+    """Reject upload requests whose body exceeds a limit while it streams in
+
+    Starlette spools the whole multipart body before a handler runs, so a
+    check in the handler only fires after the upload has arrived. This ASGI
+    middleware rejects a declared Content-Length over the limit up front and
+    counts body bytes as they are received, failing with 413 as soon as
+    the running total passes the limit.
+    """
+
+    def __init__(self, app, max_body_size: int, path_prefixes: Sequence[str]):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_prefixes = tuple(path_prefixes)
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {settings.max_file_size / 1024 / 1024:.0f}MB"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse(status_code=413, content={"detail": self._too_large().detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    # Raised inside body parsing; FastAPI turns it into the 413 response
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def setup_upload_limits(app):
+    """Enforce max_file_size on upload endpoints while the request body streams in"""
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_body_size=settings.max_file_size + settings.upload_body_overhead,
+        path_prefixes=["/gigs/upload-"]
+    )
@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.types import DateTime
+from sqlalchemy.dialects import sqlite
 from .database import Base
 
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds; bind parameters in the
+# same format so range comparisons against server-side defaults line up
+ServerTimestamp = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -31,11 +39,16 @@ class Gig(Base):
     story_type = Column(String, nullable=False)  # "morning rush", "lunch specials", "closing", "unboxing", "try-on", "demo"
     raw_footage_url = Column(String)  # S3 URL for uploaded raw footage
     status = Column(String, default="pending")  # pending/claimed/completed
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(ServerTimestamp, server_default=func.now())
     
     # Relationships
     business = relationship("User", back_populates="gigs", foreign_keys=[business_id])
     submissions = relationship("Submission", back_populates="gig")
+    
+    __table_args__ = (
+        # Backs keyset pagination of the marketplace (/gigs/available)
+        Index("ix_gigs_status_created_at_id", "status", "created_at", "id"),
+    )
 
 class Submission(Base):
     __tablename__ = "submissions"
@@ -55,6 +68,55 @@ class Submission(Base):
     # Relationships
     gig = relationship("Gig", back_populates="submissions")
     clipper = relationship("User", back_populates="submissions", foreign_keys=[clipper_id])
+    
+    __table_args__ = (
+        # A clipper can claim a given gig only once
+        UniqueConstraint("gig_id", "clipper_id", name="uq_submissions_gig_clipper"),
+        # Clipper earnings aggregate
+        Index("ix_submissions_clipper_id_approved", "clipper_id", "approved"),
+    )
+
+class Payout(Base):
+    """Payout ledger: one row per paid (or attempted) submission"""
+    __tablename__ = "payouts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=False, unique=True)
+    business_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    clipper_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    base_pay = Column(Float, nullable=False)
+    bonus = Column(Float, nullable=False)
+    platform_fee = Column(Float, nullable=False)
+    amount = Column(Float, nullable=False)  # paid to the clipper
+    idempotency_key = Column(String, nullable=False, unique=True)  # sent to the provider
+    status = Column(String, default="pending", nullable=False)  # pending/submitted/paid/failed
+    provider_payout_id = Column(String, index=True)  # matched by payout webhooks
+    error = Column(Text)
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class WebhookEvent(Base):
+    """Raw Stripe webhook events, stored before asynchronous processing"""
+    __tablename__ = "webhook_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String, nullable=False, unique=True)  # Stripe event id, deduplicated
+    type = Column(String, nullable=False)
+    object_id = Column(String, nullable=False)  # events for one object are processed in order
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending/processing/processed/failed
+    attempts = Column(Integer, default=0, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    received_at = Column(DateTime, server_default=func.now())
+    claimed_at = Column(DateTime)  # when a worker moved it to processing
+    processed_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_webhook_events_status_id", "status", "id"),
+        Index("ix_webhook_events_object_id_id", "object_id", "id"),
+    )
 
 class Lesson(Base):
     __tablename__ = "lessons"
@@ -85,10 +147,18 @@ class Credit(Base):
     amount = Column(Float, nullable=False)
     source = Column(String, nullable=False)  # self-promo/gig_post
     expiry = Column(DateTime, nullable=False)  # +6 months from creation
+    expired = Column(Boolean, default=False, nullable=False)  # set by the expiry sweeper
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="credits")
+    
+    __table_args__ = (
+        # Active credit listing, the expiry sweep and the self-promo monthly cap window
+        Index("ix_credits_user_id_expired", "user_id", "expired"),
+        Index("ix_credits_expired_expiry", "expired", "expiry"),
+        Index("ix_credits_user_id_source_created_at", "user_id", "source", "created_at"),
+    )
 
 class SelfPromo(Base):
     __tablename__ = "self_promos"
@@ -102,4 +172,50 @@ class SelfPromo(Base):
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
-    business = relationship("User", back_populates="self_promos") 
\ No newline at end of file
+    business = relationship("User", back_populates="self_promos")
+
+class StoredFile(Base):
+    """Uploaded files by content hash, so re-uploads within a folder are stored once"""
+    __tablename__ = "stored_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    folder = Column(String, nullable=False)  # e.g. raw-footage; identical content is only shared within a folder
+    content_hash = Column(String(64), index=True, nullable=False)  # SHA-256 hex digest
+    key = Column(String, nullable=False)  # storage key, e.g. raw-footage/<hash>.mp4
+    url = Column(String, index=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=False)
+    thumbnail_urls = Column(JSON)  # {"small": url, "medium": url}, filled in by the thumbnail worker
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("folder", "content_hash", name="uq_stored_files_folder_content_hash"),
+    )
+
+class UserRollup(Base):
+    """Running per-user totals, maintained incrementally by services.rollups"""
+    __tablename__ = "user_rollups"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    credits_issued = Column(Float, default=0.0, nullable=False)  # lifetime credits
+    credits_expired = Column(Float, default=0.0, nullable=False)  # swept by services.credit_expiry
+    total_spent = Column(Float, default=0.0, nullable=False)  # sum of posted gig budgets
+    gigs_total = Column(Integer, default=0, nullable=False)
+    gigs_active = Column(Integer, default=0, nullable=False)  # pending or claimed
+    gigs_completed = Column(Integer, default=0, nullable=False)
+    total_views = Column(Integer, default=0, nullable=False)  # across submissions to the user's gigs
+    total_likes = Column(Integer, default=0, nullable=False)
+    total_outcomes = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class StoryTypeRollup(Base):
+    """Running per-business totals for each story type"""
+    __tablename__ = "story_type_rollups"
+    
+    business_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    story_type = Column(String, primary_key=True)
+    gigs_count = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0.0, nullable=False)
+    total_views = Column(Integer, default=0, nullable=False)
+    total_likes = Column(Integer, default=0, nullable=False)
+    total_outcomes = Column(Integer, default=0, nullable=False)
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
 
 from ..database import get_db
-from ..models import User, Gig, Submission, Credit, SelfPromo
+from ..models import User, Gig, Submission, SelfPromo
 from ..config import get_settings
 
 settings = get_settings()
@@ -15,54 +14,68 @@ from ..schemas import (
     GigResponse, 
     SubmissionResponse,
     CreditResponse,
-    UserResponse
+    UserResponse,
+    BonusScenario
 )
 from ..auth import get_current_active_user
+from ..services.rollups import get_user_rollup, get_story_type_rollups
+from ..services.payouts import get_clipper_earnings
+from ..services.credits import issue_credit, get_active_credits, get_credit_totals, get_recent_credit_total
+from ..services.bonus import (
+    MIN_VIEWS,
+    MIN_LIKES,
+    calculate_bonus,
+    calculate_bonuses,
+    get_bonus_breakdown
+)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+def load_dashboard_data(db: Session, user: User) -> Dict[str, Any]:
+    """Load gigs, submissions and credits for the dashboard in three queries"""
+    
+    # User's gigs and related submissions in one joined query
+    if user.role == "business_local":
+        rows = db.query(Gig, Submission).outerjoin(
+            Submission, Submission.gig_id == Gig.id
+        ).filter(
+            Gig.business_id == user.id
+        ).order_by(Gig.id, Submission.id).all()
+    else:  # clipper
+        rows = db.query(Gig, Submission).join(
+            Submission, Submission.gig_id == Gig.id
+        ).filter(
+            Submission.clipper_id == user.id
+        ).order_by(Gig.id, Submission.id).all()
+    gigs = list({gig.id: gig for gig, _ in rows}.values())
+    submissions = [submission for _, submission in rows if submission is not None]
+    
+    credits = get_active_credits(db, user.id)
+    total_credits, expired_credits = get_credit_totals(db, user.id)
+    
+    return {
+        "gigs": gigs,
+        "submissions": submissions,
+        "credits": credits,
+        "total_credits": total_credits,
+        "expired_credits": expired_credits
+    }
+
 @router.get("/", response_model=DashboardResponse)
 def get_dashboard(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get comprehensive dashboard data for current user"""
-    
-    # Get user's gigs
-    if current_user.role == "business_local":
-        gigs = db.query(Gig).filter(Gig.business_id == current_user.id).all()
-        submissions = []
-        # Get submissions for business's gigs
-        for gig in gigs:
-            gig_submissions = db.query(Submission).filter(Submission.gig_id == gig.id).all()
-            submissions.extend(gig_submissions)
-    else:  # clipper
-        submissions = db.query(Submission).filter(Submission.clipper_id == current_user.id).all()
-        gig_ids = [sub.gig_id for sub in submissions]
-        gigs = db.query(Gig).filter(Gig.id.in_(gig_ids)).all() if gig_ids else []
-    
-    # Get user's credits (only non-expired)
-    now = datetime.utcnow()
-    credits = db.query(Credit).filter(
-        Credit.user_id == current_user.id,
-        Credit.expiry > now
-    ).all()
-    total_credits = sum(credit.amount for credit in credits)
-    
-    # Get expired credits for information
-    expired_credits = db.query(Credit).filter(
-        Credit.user_id == current_user.id,
-        Credit.expiry <= now
-    ).all()
-    expired_credits_amount = sum(credit.amount for credit in expired_credits)
+    data = load_dashboard_data(db, current_user)
     
     return DashboardResponse(
         user=UserResponse.from_orm(current_user),
-        gigs=[GigResponse.from_orm(gig) for gig in gigs],
-        submissions=[SubmissionResponse.from_orm(sub) for sub in submissions],
-        credits=[CreditResponse.from_orm(credit) for credit in credits],
-        total_credits=total_credits,
-        expired_credits=expired_credits_amount
+        gigs=[GigResponse.from_orm(gig) for gig in data["gigs"]],
+        submissions=[SubmissionResponse.from_orm(sub) for sub in data["submissions"]],
+        credits=[CreditResponse.from_orm(credit) for credit in data["credits"]],
+        total_credits=data["total_credits"],
+        expired_credits=data["expired_credits"]
     )
 
 @router.get("/analytics")
@@ -80,61 +93,34 @@ def get_analytics(
 def get_business_analytics(db: Session, user: User) -> Dict[str, Any]:
     """Get analytics for business users"""
     
-    # Get all gigs and their submissions
-    gigs = db.query(Gig).filter(Gig.business_id == user.id).all()
-    all_submissions = []
-    for gig in gigs:
-        submissions = db.query(Submission).filter(Submission.gig_id == gig.id).all()
-        all_submissions.extend(submissions)
-    
-    # Calculate metrics
-    total_views = sum(sub.views for sub in all_submissions)
-    total_likes = sum(sub.likes for sub in all_submissions)
-    total_outcomes = sum(sub.outcomes for sub in all_submissions)
-    total_spent = sum(gig.budget for gig in gigs)
-    
-    # ROI calculation (simplified)
-    roi_percentage = (total_outcomes * 10 / total_spent * 100) if total_spent > 0 else 0
+    # Totals are read from the incrementally maintained rollups
+    rollup = get_user_rollup(db, user.id)
     
     # Performance by story type
     story_performance = {}
-    for gig in gigs:
-        story_type = gig.story_type
-        if story_type not in story_performance:
-            story_performance[story_type] = {
-                "gigs_count": 0,
-                "total_views": 0,
-                "total_likes": 0,
-                "total_outcomes": 0,
-                "avg_views": 0
-            }
-        
-        story_performance[story_type]["gigs_count"] += 1
-        gig_submissions = [s for s in all_submissions if s.gig_id == gig.id]
-        story_views = sum(s.views for s in gig_submissions)
-        story_likes = sum(s.likes for s in gig_submissions)
-        story_outcomes = sum(s.outcomes for s in gig_submissions)
-        
-        story_performance[story_type]["total_views"] += story_views
-        story_performance[story_type]["total_likes"] += story_likes
-        story_performance[story_type]["total_outcomes"] += story_outcomes
+    for story in get_story_type_rollups(db, user.id):
+        story_performance[story.story_type] = {
+            "gigs_count": story.gigs_count,
+            "total_views": story.total_views,
+            "total_likes": story.total_likes,
+            "total_outcomes": story.total_outcomes,
+            "avg_views": story.total_views / story.gigs_count if story.gigs_count > 0 else 0
+        }
     
-    # Calculate averages
-    for story_type in story_performance:
-        count = story_performance[story_type]["gigs_count"]
-        if count > 0:
-            story_performance[story_type]["avg_views"] = story_performance[story_type]["total_views"] / count
+    # ROI calculation (simplified)
+    total_spent = rollup.total_spent
+    roi_percentage = (rollup.total_outcomes * 10 / total_spent * 100) if total_spent > 0 else 0
     
     return {
         "role": "business_local",
         "summary": {
-            "total_gigs": len(gigs),
-            "active_gigs": len([g for g in gigs if g.status in ["pending", "claimed"]]),
-            "completed_gigs": len([g for g in gigs if g.status == "completed"]),
+            "total_gigs": rollup.gigs_total,
+            "active_gigs": rollup.gigs_active,
+            "completed_gigs": rollup.gigs_completed,
             "total_spent": total_spent,
-            "total_views": total_views,
-            "total_likes": total_likes,
-            "total_outcomes": total_outcomes,
+            "total_views": rollup.total_views,
+            "total_likes": rollup.total_likes,
+            "total_outcomes": rollup.total_outcomes,
             "roi_percentage": roi_percentage
         },
         "performance_by_story_type": story_performance,
@@ -144,29 +130,13 @@ def get_business_analytics(db: Session, user: User) -> Dict[str, Any]:
 def get_clipper_analytics(db: Session, user: User) -> Dict[str, Any]:
     """Get analytics for clipper users"""
     
-    submissions = db.query(Submission).filter(Submission.clipper_id == user.id).all()
-    
-    # Calculate earnings
-    total_earnings = 0
-    total_bonuses = 0
-    for submission in submissions:
-        if submission.approved:
-            base_pay = 100.0
-            bonus = submission.bonus
-            platform_fee = (base_pay + bonus) * 0.12  # 12% platform fee
-            earnings = (base_pay + bonus) - platform_fee
-            total_earnings += earnings
-            total_bonuses += bonus
-    
-    # Performance metrics
-    total_views = sum(sub.views for sub in submissions)
-    total_likes = sum(sub.likes for sub in submissions)
-    total_outcomes = sum(sub.outcomes for sub in submissions)
+    # Earnings and performance totals in one aggregate
+    earnings = get_clipper_earnings(db, user.id)
     
     # Average performance per gig
-    completed_submissions = [s for s in submissions if s.approved]
-    avg_views = total_views / len(completed_submissions) if completed_submissions else 0
-    avg_likes = total_likes / len(completed_submissions) if completed_submissions else 0
+    completed = earnings["completed_gigs"]
+    avg_views = earnings["total_views"] / completed if completed else 0
+    avg_likes = earnings["total_likes"] / completed if completed else 0
     
     # Check certifications
     from ..models import Certification
@@ -178,14 +148,7 @@ def get_clipper_analytics(db: Session, user: User) -> Dict[str, Any]:
     return {
         "role": "clipper",
         "summary": {
-            "total_gigs": len(submissions),
-            "completed_gigs": len(completed_submissions),
-            "pending_approval": len([s for s in submissions if not s.approved]),
-            "total_earnings": total_earnings,
-            "total_bonuses": total_bonuses,
-            "total_views": total_views,
-            "total_likes": total_likes,
-            "total_outcomes": total_outcomes,
+            **earnings,
             "avg_views_per_gig": avg_views,
             "avg_likes_per_gig": avg_likes
         },
@@ -213,16 +176,17 @@ def get_recent_activity(db: Session, user: User, role: str) -> List[Dict[str, An
             })
     
     else:  # clipper
-        # Recent submissions
-        recent_submissions = db.query(Submission).filter(
+        # Recent submissions with their gig's story type
+        recent_submissions = db.query(Submission, Gig.story_type).outerjoin(
+            Gig, Submission.gig_id == Gig.id
+        ).filter(
             Submission.clipper_id == user.id
         ).order_by(Submission.created_at.desc()).limit(5).all()
         
-        for submission in recent_submissions:
-            gig = db.query(Gig).filter(Gig.id == submission.gig_id).first()
+        for submission, story_type in recent_submissions:
             activities.append({
                 "type": "submission",
-                "description": f"Submitted video for: {gig.story_type if gig else 'Unknown'}",
+                "description": f"Submitted video for: {story_type or 'Unknown'}",
                 "views": submission.views,
                 "likes": submission.likes,
                 "bonus": submission.bonus,
@@ -247,14 +211,7 @@ def upload_self_promo(
         )
     
     # Check monthly credit limit ($15/month cap)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_credits = db.query(Credit).filter(
-        Credit.user_id == current_user.id,
-        Credit.source == "self-promo",
-        Credit.created_at >= thirty_days_ago
-    ).all()
-    
-    total_recent_credits = sum(credit.amount for credit in recent_credits)
+    total_recent_credits = get_recent_credit_total(db, current_user.id, "self-promo", days=30)
     
     if total_recent_credits >= settings.monthly_self_promo_cap:
         raise HTTPException(
@@ -313,14 +270,7 @@ def update_self_promo_metrics(
             self_promo.credit_earned = credit_amount
             
             # Add credit to user account with 6-month expiry
-            credit_expiry = datetime.utcnow() + timedelta(days=30 * settings.credit_expiry_months)
-            credit = Credit(
-                user_id=current_user.id,
-                amount=credit_amount,
-                source="self-promo",
-                expiry=credit_expiry
-            )
-            db.add(credit)
+            issue_credit(db, current_user.id, credit_amount, "self-promo")
     
     db.commit()
     db.refresh(self_promo)
@@ -366,8 +316,7 @@ def calculate_bonus_preview(
                 detail="You can only view calculations for your own gig submissions"
             )
     
-    # Calculate bonus using the same logic as in gigs.py
-    bonus = calculate_bonus_amount(views, likes, outcomes)
+    bonus = calculate_bonus(views, likes, outcomes)
     
     return {
         "submission_id": submission_id,
@@ -378,86 +327,25 @@ def calculate_bonus_preview(
         },
         "bonus_calculation": {
             "bonus_amount": bonus,
-            "meets_minimum": views >= 300 and likes >= 30,
+            "meets_minimum": views >= MIN_VIEWS and likes >= MIN_LIKES,
             "breakdown": get_bonus_breakdown(views, likes, outcomes)
         }
     }
 
-def calculate_bonus_amount(views: int, likes: int, outcomes: int) -> float:
-    """Calculate bonus based on tiered engagement metrics"""
-    # Minimum thresholds
-    if views < 300 or likes < 30:
-        return 0.0
-    
-    bonus = 0.0
-    
-    # Views bonus (tiered)
-    if views < 500:
-        bonus += views * 0.005
-    elif views < 2000:
-        bonus += views * 0.01
-    else:
-        bonus += views * 0.015
-    
-    # Likes bonus (tiered)
-    if likes < 50:
-        bonus += likes * 0.03
-    elif likes < 200:
-        bonus += likes * 0.05
-    else:
-        bonus += likes * 0.07
-    
-    # Outcomes bonus (hybrid 30% weight)
-    bonus += outcomes * 0.10 * 0.3
-    
-    # Cap at $75
-    return min(bonus, 75.0)
-
-def get_bonus_breakdown(views: int, likes: int, outcomes: int) -> Dict[str, Any]:
-    """Get detailed breakdown of bonus calculation"""
-    breakdown = {
-        "views_bonus": 0.0,
-        "likes_bonus": 0.0,
-        "outcomes_bonus": 0.0,
-        "total_before_cap": 0.0,
-        "cap_applied": False
+@router.post("/bonus-preview")
+def preview_bonuses(
+    scenarios: List[BonusScenario],
+    current_user: User = Depends(get_current_active_user)
+):
+    """Calculate bonuses for many what-if metric scenarios at once (doesn't save)"""
+    bonuses = calculate_bonuses(
+        [scenario.views for scenario in scenarios],
+        [scenario.likes for scenario in scenarios],
+        [scenario.outcomes for scenario in scenarios]
+    )
+    return {
+        "bonuses": [
+            {**scenario.dict(), "bonus_amount": float(bonus)}
+            for scenario, bonus in zip(scenarios, bonuses)
+        ]
     }
-    
-    if views < 300 or likes < 30:
-        return breakdown
-    
-    # Views calculation
-    if views < 500:
-        breakdown["views_bonus"] = views * 0.005
-        breakdown["views_rate"] = "$0.005/view"
-    elif views < 2000:
-        breakdown["views_bonus"] = views * 0.01
-        breakdown["views_rate"] = "$0.01/view"
-    else:
-        breakdown["views_bonus"] = views * 0.015
-        breakdown["views_rate"] = "$0.015/view"
-    
-    # Likes calculation
-    if likes < 50:
-        breakdown["likes_bonus"] = likes * 0.03
-        breakdown["likes_rate"] = "$0.03/like"
-    elif likes < 200:
-        breakdown["likes_bonus"] = likes * 0.05
-        breakdown["likes_rate"] = "$0.05/like"
-    else:
-        breakdown["likes_bonus"] = likes * 0.07
-        breakdown["likes_rate"] = "$0.07/like"
-    
-    # Outcomes calculation
-    breakdown["outcomes_bonus"] = outcomes * 0.10 * 0.3
-    breakdown["outcomes_rate"] = "$0.10/outcome (30% weight)"
-    
-    breakdown["total_before_cap"] = breakdown["views_bonus"] + breakdown["likes_bonus"] + breakdown["outcomes_bonus"]
-    
-    if breakdown["total_before_cap"] > 75.0:
-        breakdown["cap_applied"] = True
-        breakdown["final_bonus"] = 75.0
-    else:
-        breakdown["final_bonus"] = breakdown["total_before_cap"]
-    
-    return breakdown 
\ No newline at end of file
@@ -1,14 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
 
-from ..database import get_db
-from ..models import User, Gig, Submission, Credit
-from ..schemas import GigCreate, GigResponse, SubmissionCreate, SubmissionResponse, SubmissionUpdate
+from ..database import get_db, get_request_db, run_db
+from ..models import User, Gig, Submission
+from ..schemas import (
+    GigCreate,
+    GigResponse,
+    SubmissionCreate,
+    SubmissionResponse,
+    SubmissionUpdate,
+    SubmissionMetricsRecord
+)
 from ..auth import get_current_active_user, require_role
-from ..services.file_upload import upload_video_to_s3
+from ..services.file_upload import upload_video_to_s3, generate_video_thumbnail
 from ..services.email import send_gig_claimed_notification, send_video_submitted_notification
+from ..services.bonus import calculate_bonus, calculate_bonuses
+from ..services.credits import issue_credit
+from ..services.rollups import (
+    record_gig_posted,
+    record_gig_status_change,
+    record_metrics_change
+)
 from ..config import get_settings
 
 settings = get_settings()
@@ -41,14 +59,9 @@ def post_gig(
     db.add(db_gig)
     
     # Add gig posting credit ($5 per gig posted) with 6-month expiry
-    credit_expiry = datetime.utcnow() + timedelta(days=30 * settings.credit_expiry_months)
-    credit = Credit(
-        user_id=current_user.id,
-        amount=settings.gig_post_credit,
-        source="gig_post",
-        expiry=credit_expiry
-    )
-    db.add(credit)
+    issue_credit(db, current_user.id, settings.gig_post_credit, "gig_post")
+    
+    record_gig_posted(db, current_user.id, gig.story_type, gig.budget)
     
     db.commit()
     db.refresh(db_gig)
@@ -58,25 +71,82 @@ def post_gig(
 @router.post("/upload-raw-footage")
 async def upload_raw_footage(
     file: UploadFile = File(...),
+    db=Depends(get_request_db),
     current_user: User = Depends(require_role("business_local"))
 ):
-    """Upload raw footage for a gig"""
+    """Upload raw footage for a gig and return its thumbnail"""
     try:
-        file_url = await upload_video_to_s3(file, "raw-footage")
-        return {"raw_footage_url": file_url}
+        file_url = await upload_video_to_s3(file, "raw-footage", db)
+        # Rendered off the event loop; repeat uploads of the same video hit the cache
+        thumbnail_url = await generate_video_thumbnail(file_url)
+        return {"raw_footage_url": file_url, "thumbnail_url": thumbnail_url}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Upload failed: {str(e)}"
         )
 
+def encode_gig_cursor(gig: Gig) -> str:
+    """Encode the (created_at, id) position of a gig as an opaque cursor"""
+    raw = f"{gig.created_at.isoformat()}|{gig.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_gig_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_gig_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, gig_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(gig_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
 @router.get("/available", response_model=List[GigResponse])
 def get_available_gigs(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    story_type: Optional[str] = None,
+    goals: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("clipper"))
 ):
-    """Get available gigs for clippers"""
-    gigs = db.query(Gig).filter(Gig.status == "pending").all()
+    """Get a page of available gigs for clippers, newest first
+    
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    query = db.query(Gig).filter(Gig.status == "pending")
+    
+    # Optional filters
+    if story_type:
+        query = query.filter(Gig.story_type == story_type)
+    if goals:
+        query = query.filter(Gig.goals == goals)
+    if min_budget is not None:
+        query = query.filter(Gig.budget >= min_budget)
+    if max_budget is not None:
+        query = query.filter(Gig.budget <= max_budget)
+    
+    # Keyset pagination on (created_at, id)
+    if cursor:
+        cursor_created_at, cursor_id = decode_gig_cursor(cursor)
+        query = query.filter(or_(
+            Gig.created_at < cursor_created_at,
+            and_(Gig.created_at == cursor_created_at, Gig.id < cursor_id)
+        ))
+    
+    gigs = query.order_by(Gig.created_at.desc(), Gig.id.desc()).limit(limit + 1).all()
+    
+    if len(gigs) > limit:
+        gigs = gigs[:limit]
+        response.headers["X-Next-Cursor"] = encode_gig_cursor(gigs[-1])
+    
     return gigs
 
 @router.get("/my-gigs", response_model=List[GigResponse])
@@ -96,60 +166,69 @@ def get_my_gigs(
     
     return gigs
 
-@router.post("/{gig_id}/claim")
-async def claim_gig(
-    gig_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role("clipper"))
-):
-    """Claim a gig (clipper only)"""
-    # Check if gig exists and is available
-    gig = db.query(Gig).filter(Gig.id == gig_id).first()
-    if not gig:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gig not found"
-        )
+def claim_gig_for_clipper(db: Session, gig_id: int, clipper_id: int) -> Tuple[int, Optional[str], str]:
+    """Claim a pending gig; returns (submission_id, business_email, story_type)"""
+    # Move the gig from pending to claimed in a single conditional update so
+    # that only one clipper can win a race for the same gig
+    claimed_gig = db.execute(
+        update(Gig)
+        .where(Gig.id == gig_id, Gig.status == "pending")
+        .values(status="claimed")
+        .returning(Gig.business_id, Gig.story_type)
+    ).first()
     
-    if gig.status != "pending":
+    if claimed_gig is None:
+        db.rollback()
+        if db.query(Gig.id).filter(Gig.id == gig_id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gig not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Gig is not available for claiming"
         )
     
-    # Check if clipper already claimed this gig
-    existing_submission = db.query(Submission).filter(
-        Submission.gig_id == gig_id,
-        Submission.clipper_id == current_user.id
-    ).first()
+    record_gig_status_change(db, claimed_gig.business_id, "pending", "claimed")
     
-    if existing_submission:
+    # Create submission record; (gig_id, clipper_id) is unique
+    submission = Submission(
+        gig_id=gig_id,
+        clipper_id=clipper_id
+    )
+    db.add(submission)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You have already claimed this gig"
         )
     
-    # Create submission record and update gig status
-    submission = Submission(
-        gig_id=gig_id,
-        clipper_id=current_user.id
+    business_email = db.query(User.email).filter(User.id == claimed_gig.business_id).scalar()
+    return submission.id, business_email, claimed_gig.story_type
+
+@router.post("/{gig_id}/claim")
+async def claim_gig(
+    gig_id: int,
+    db=Depends(get_request_db),
+    current_user: User = Depends(require_role("clipper"))
+):
+    """Claim a gig (clipper only)"""
+    submission_id, business_email, story_type = await run_db(
+        db, claim_gig_for_clipper, gig_id, current_user.id
     )
-    gig.status = "claimed"
-    
-    db.add(submission)
-    db.commit()
-    db.refresh(submission)
     
     # Send notification to business
-    business = db.query(User).filter(User.id == gig.business_id).first()
-    if business:
+    if business_email:
         await send_gig_claimed_notification(
-            business.email, 
-            gig.story_type, 
+            business_email, 
+            story_type, 
             current_user.email
         )
     
-    return {"message": "Gig claimed successfully", "submission_id": submission.id}
+    return {"message": "Gig claimed successfully", "submission_id": submission_id}
 
 @router.post("/submit-video", response_model=SubmissionResponse)
 def submit_video(
@@ -176,6 +255,7 @@ def submit_video(
     
     # Update gig status to completed
     gig = db.query(Gig).filter(Gig.id == submission.gig_id).first()
+    record_gig_status_change(db, gig.business_id, gig.status, "completed")
     gig.status = "completed"
     
     db.commit()
@@ -199,6 +279,8 @@ def update_submission_metrics(
             detail="Submission not found"
         )
     
+    gig = db.query(Gig).filter(Gig.id == submission.gig_id).first()
+    
     # Check permissions - clipper can update their own, business can update their gig's submissions
     if current_user.role == "clipper" and submission.clipper_id != current_user.id:
         raise HTTPException(
@@ -206,13 +288,14 @@ def update_submission_metrics(
             detail="You can only update your own submissions"
         )
     elif current_user.role == "business_local":
-        gig = db.query(Gig).filter(Gig.id == submission.gig_id).first()
         if gig.business_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only update submissions for your own gigs"
             )
     
+    previous = (submission.views or 0, submission.likes or 0, submission.outcomes or 0)
+    
     # Update metrics
     if metrics.views is not None:
         submission.views = metrics.views
@@ -221,6 +304,15 @@ def update_submission_metrics(
     if metrics.outcomes is not None:
         submission.outcomes = metrics.outcomes
     
+    record_metrics_change(
+        db,
+        gig.business_id,
+        gig.story_type,
+        (submission.views or 0) - previous[0],
+        (submission.likes or 0) - previous[1],
+        (submission.outcomes or 0) - previous[2]
+    )
+    
     # Calculate bonus based on updated metrics
     submission.bonus = calculate_bonus(submission.views, submission.likes, submission.outcomes)
     
@@ -229,40 +321,144 @@ def update_submission_metrics(
     
     return submission
 
-def calculate_bonus(views: int, likes: int, outcomes: int) -> float:
-    """Calculate pure performance bonus (no base pay)"""
-    # Minimum thresholds - must meet both
-    if views < 300 or likes < 30:
-        return 0.0
-    
-    bonus = 0.0
-    
-    # Views bonus (tiered) - 70% weight
-    views_bonus = 0.0
-    if views < 500:
-        views_bonus = views * 0.005
-    elif views < 2000:
-        views_bonus = views * 0.01
-    else:
-        views_bonus = views * 0.015
-    
-    # Likes bonus (tiered) - 70% weight  
-    likes_bonus = 0.0
-    if likes < 50:
-        likes_bonus = likes * 0.03
-    elif likes < 200:
-        likes_bonus = likes * 0.05
+def apply_metrics_batch(
+    db: Session,
+    records: List[SubmissionMetricsRecord],
+    user_id: int,
+    role: str
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Validate ownership and write metrics for a batch of submissions
+    
+    Returns the number of submissions updated and the rejected records.
+    """
+    # Later records for the same submission override earlier ones
+    merged: Dict[int, Dict[str, int]] = {}
+    for record in records:
+        fields = {k: v for k, v in record.dict(exclude={"submission_id"}).items() if v is not None}
+        merged.setdefault(record.submission_id, {}).update(fields)
+    
+    # One query for current metrics and ownership of the whole batch
+    rows = db.query(
+        Submission.id,
+        Submission.clipper_id,
+        Gig.business_id,
+        Gig.story_type,
+        Submission.views,
+        Submission.likes,
+        Submission.outcomes
+    ).join(
+        Gig, Submission.gig_id == Gig.id
+    ).filter(
+        Submission.id.in_(list(merged))
+    ).all()
+    
+    rejected = []
+    found = {row.id: row for row in rows}
+    updates = []
+    metric_deltas: Dict[Tuple[int, str], List[int]] = {}
+    for submission_id, fields in merged.items():
+        row = found.get(submission_id)
+        if row is None:
+            rejected.append({"submission_id": submission_id, "reason": "Submission not found"})
+            continue
+        if role == "clipper" and row.clipper_id != user_id:
+            rejected.append({"submission_id": submission_id, "reason": "You can only update your own submissions"})
+            continue
+        if role == "business_local" and row.business_id != user_id:
+            rejected.append({"submission_id": submission_id, "reason": "You can only update submissions for your own gigs"})
+            continue
+        values = {
+            "id": submission_id,
+            "views": fields.get("views", row.views or 0),
+            "likes": fields.get("likes", row.likes or 0),
+            "outcomes": fields.get("outcomes", row.outcomes or 0)
+        }
+        updates.append(values)
+        
+        deltas = metric_deltas.setdefault((row.business_id, row.story_type), [0, 0, 0])
+        deltas[0] += values["views"] - (row.views or 0)
+        deltas[1] += values["likes"] - (row.likes or 0)
+        deltas[2] += values["outcomes"] - (row.outcomes or 0)
+    
+    if updates:
+        # Recalculate bonuses for the whole batch in one pass
+        bonuses = calculate_bonuses(
+            [u["views"] for u in updates],
+            [u["likes"] for u in updates],
+            [u["outcomes"] for u in updates]
+        )
+        for values, bonus in zip(updates, bonuses):
+            values["bonus"] = float(bonus)
+        db.execute(update(Submission), updates)
+        for (business_id, story_type), (views, likes, outcomes) in metric_deltas.items():
+            record_metrics_change(db, business_id, story_type, views, likes, outcomes)
+        db.commit()
+    
+    return len(updates), rejected
+
+async def _read_metrics_records(request: Request):
+    """Yield (position, raw record) from a JSON array or an NDJSON stream"""
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        position = 0
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield position, line
+                    position += 1
+        if pending.strip():
+            yield position, pending
     else:
-        likes_bonus = likes * 0.07
+        try:
+            records = await request.json()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Request body must be a JSON array or NDJSON"
+            )
+        if not isinstance(records, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Request body must be a JSON array or NDJSON"
+            )
+        for position, record in enumerate(records):
+            yield position, record
+
+@router.post("/submissions/metrics/bulk")
+async def bulk_update_submission_metrics(
+    request: Request,
+    db=Depends(get_request_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Update metrics for many submissions at once
     
-    # Combine engagements (70% weight)
-    engagement_bonus = (views_bonus + likes_bonus) * 0.7
+    Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+    of {"submission_id", "views", "likes", "outcomes"} records. Records are
+    written in batches with one bulk UPDATE per batch.
+    """
+    updated = 0
+    rejected = []
+    batch: List[SubmissionMetricsRecord] = []
     
-    # Outcomes bonus (30% weight) - check-ins or sales
-    outcome_bonus = outcomes * 0.10 * 0.3
+    async for position, raw in _read_metrics_records(request):
+        try:
+            data = json.loads(raw) if isinstance(raw, bytes) else raw
+            batch.append(SubmissionMetricsRecord(**data))
+        except (ValueError, TypeError) as e:
+            rejected.append({"record": position, "reason": f"Invalid record: {e}"})
+            continue
+        
+        if len(batch) >= settings.metrics_batch_size:
+            batch_updated, batch_rejected = await run_db(db, apply_metrics_batch, batch, current_user.id, current_user.role)
+            updated += batch_updated
+            rejected.extend(batch_rejected)
+            batch = []
     
-    # Total bonus
-    bonus = engagement_bonus + outcome_bonus
+    if batch:
+        batch_updated, batch_rejected = await run_db(db, apply_metrics_batch, batch, current_user.id, current_user.role)
+        updated += batch_updated
+        rejected.extend(batch_rejected)
     
-    # Cap at $75
-    return min(bonus, 75.0) 
\ No newline at end of file
+    return {"updated": updated, "rejected": rejected}
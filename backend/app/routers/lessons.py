@@ -1,104 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from dataclasses import asdict
 from datetime import datetime
 
 from ..database import get_db
 from ..models import User, Lesson, Certification
-from ..schemas import LessonResponse, CertificationResponse
+from ..schemas import LessonResponse, CertificationResponse, QuizAttempt
 from ..auth import get_current_active_user, require_role
+from ..services.lesson_catalog import lesson_catalog, grade_quiz, grade_attempts
 
 router = APIRouter(prefix="/lessons", tags=["lessons"])
 
-# Sample lesson data for MVP
-SAMPLE_LESSONS = [
-    {
-        "id": 1,
-        "title": "Creating Compelling Content",
-        "content": """
-        Learn how to create engaging content that drives results:
-        
-        1. Hook viewers in the first 3 seconds
-        2. Show the problem and solution clearly
-        3. Use dynamic camera movements
-        4. Include strong call-to-actions
-        5. Optimize for mobile viewing
-        
-        Video tutorial: https://example.com/lesson1
-        """,
-        "quiz": {
-            "questions": [
-                {
-                    "question": "How long do you have to hook viewers?",
-                    "options": ["1 second", "3 seconds", "5 seconds", "10 seconds"],
-                    "correct": 1
-                },
-                {
-                    "question": "What's most important for mobile optimization?",
-                    "options": ["High resolution", "Vertical format", "Long duration", "Complex editing"],
-                    "correct": 1
-                },
-                {
-                    "question": "A strong call-to-action should be:",
-                    "options": ["Subtle", "At the end only", "Clear and direct", "Optional"],
-                    "correct": 2
-                }
-            ]
-        }
-    },
-    {
-        "id": 2,
-        "title": "Performance Metrics That Matter",
-        "content": """
-        Understanding key metrics for success:
-        
-        1. View completion rates vs raw views
-        2. Engagement depth (likes, comments, shares)
-        3. Conversion tracking through outcomes
-        4. Time-of-day posting optimization
-        5. Hashtag strategy for discoverability
-        
-        Video tutorial: https://example.com/lesson2
-        """,
-        "quiz": {
-            "questions": [
-                {
-                    "question": "Which metric indicates content quality best?",
-                    "options": ["Total views", "View completion rate", "Number of hashtags", "Video length"],
-                    "correct": 1
-                },
-                {
-                    "question": "When should you track outcomes?",
-                    "options": ["Only after 1000 views", "Within 24 hours", "Throughout the campaign", "Never"],
-                    "correct": 2
-                },
-                {
-                    "question": "Optimal posting time depends on:",
-                    "options": ["Your schedule", "Target audience behavior", "Platform algorithm", "Video length"],
-                    "correct": 1
-                }
-            ]
-        }
-    }
-]
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
 
 @router.get("/", response_model=List[LessonResponse])
 def get_lessons(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("clipper"))
 ):
     """Get all available lessons for clippers"""
-    # In MVP, return sample lessons. In production, query from database
-    lessons = []
-    for lesson_data in SAMPLE_LESSONS:
-        lessons.append(LessonResponse(
-            id=lesson_data["id"],
-            title=lesson_data["title"],
-            content=lesson_data["content"],
-            quiz=lesson_data["quiz"],
-            created_at=datetime.utcnow()
-        ))
-    return lessons
+    catalog = lesson_catalog.get(db)
+    headers = {"ETag": catalog.etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    
+    if etag_matches(request.headers.get("if-none-match"), catalog.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=catalog.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
 
 @router.get("/{lesson_id}", response_model=LessonResponse)
 def get_lesson(
@@ -107,21 +44,47 @@ def get_lesson(
     current_user: User = Depends(require_role("clipper"))
 ):
     """Get a specific lesson by ID"""
-    lesson_data = next((l for l in SAMPLE_LESSONS if l["id"] == lesson_id), None)
+    lesson = lesson_catalog.get(db).by_id.get(lesson_id)
     
-    if not lesson_data:
+    if not lesson:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lesson not found"
         )
     
-    return LessonResponse(
-        id=lesson_data["id"],
-        title=lesson_data["title"],
-        content=lesson_data["content"],
-        quiz=lesson_data["quiz"],
-        created_at=datetime.utcnow()
-    )
+    return lesson
+
+@router.post("/grade-batch")
+def grade_quiz_batch(
+    attempts: List[QuizAttempt],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Score many quiz attempts at once (e.g. offline cohort results); no certifications are issued"""
+    answer_keys = lesson_catalog.get(db).answer_keys
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(attempts)
+    rejected = []
+    by_lesson: Dict[int, List[int]] = {}
+    for position, attempt in enumerate(attempts):
+        key = answer_keys.get(attempt.lesson_id)
+        if key is None:
+            rejected.append({"attempt": position, "reference": attempt.reference, "reason": "Lesson not found"})
+        elif len(attempt.answers) != len(key):
+            rejected.append({"attempt": position, "reference": attempt.reference, "reason": "Number of answers doesn't match number of questions"})
+        else:
+            by_lesson.setdefault(attempt.lesson_id, []).append(position)
+    
+    # Grade each lesson's attempts in one vectorized pass
+    for lesson_id, positions in by_lesson.items():
+        grades = grade_attempts(answer_keys[lesson_id], lesson_id, [attempts[p].answers for p in positions])
+        for position, grade in zip(positions, grades):
+            results[position] = {"attempt": position, "reference": attempts[position].reference, **asdict(grade)}
+    
+    return {
+        "results": [result for result in results if result is not None],
+        "rejected": rejected
+    }
 
 @router.post("/{lesson_id}/complete-quiz")
 def complete_quiz(
@@ -131,9 +94,9 @@ def complete_quiz(
     current_user: User = Depends(require_role("clipper"))
 ):
     """Complete a lesson quiz and get certification if passed"""
-    lesson_data = next((l for l in SAMPLE_LESSONS if l["id"] == lesson_id), None)
+    key = lesson_catalog.get(db).answer_keys.get(lesson_id)
     
-    if not lesson_data:
+    if key is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lesson not found"
@@ -146,33 +109,18 @@ def complete_quiz(
         )
     
     user_answers = answers["answers"]
-    quiz = lesson_data["quiz"]
     
-    if len(user_answers) != len(quiz["questions"]):
+    if len(user_answers) != len(key):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Number of answers doesn't match number of questions"
         )
     
-    # Calculate score
-    correct_answers = 0
-    for i, question in enumerate(quiz["questions"]):
-        if i < len(user_answers) and user_answers[i] == question["correct"]:
-            correct_answers += 1
-    
-    score = (correct_answers / len(quiz["questions"])) * 100
-    passed = score >= 70  # 70% passing grade
-    
-    result = {
-        "lesson_id": lesson_id,
-        "score": score,
-        "passed": passed,
-        "correct_answers": correct_answers,
-        "total_questions": len(quiz["questions"])
-    }
+    grade = grade_quiz(key, lesson_id, user_answers)
+    result = asdict(grade)
     
     # If passed, create or update certification
-    if passed:
+    if grade.passed:
         # Check if user already has certification for this lesson
         certification = db.query(Certification).filter(
             Certification.clipper_id == current_user.id,
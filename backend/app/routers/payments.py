@@ -1,24 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import Dict, Any
-import stripe
-import os
 from datetime import datetime
 
-from ..database import get_db
-from ..models import User, Gig, Submission
+from ..database import get_db, get_request_db, run_db
+from ..models import User, Gig, Submission, Payout
 from ..schemas import PaymentCreate, PaymentResponse
 from ..auth import get_current_active_user, require_role
+from ..services.credits import get_credit_balance
+from ..services.payouts import get_clipper_earnings, run_payouts
+from ..services.webhooks import InvalidWebhookSignature, store_webhook_event, verify_webhook_signature, webhook_dispatcher
+from ..services.rollups import get_user_rollup
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
-# Stripe configuration
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_placeholder")
-STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_placeholder")
+# Stripe configuration: the API key is passed per call by services.payouts and
+# the webhook secret (settings.stripe_webhook_secret) is used by services.webhooks
 
-# Platform fees
+# Platform fees (clipper fee and base pay live in services.payouts)
 BUSINESS_FEE_RATE = 0.08  # 8%
-CLIPPER_FEE_RATE = 0.12   # 12% average (10-15%)
 
 @router.post("/deposit", response_model=PaymentResponse)
 def create_deposit(
@@ -96,52 +96,38 @@ def process_payout(
             detail="Submission must be approved before payout"
         )
     
-    try:
-        # Calculate payout amounts
-        base_pay = 100.0  # Base $100 payment as specified
-        bonus = submission.bonus
-        total_earnings = base_pay + bonus
-        platform_fee = total_earnings * CLIPPER_FEE_RATE
-        payout_amount = total_earnings - platform_fee
-        
-        # For MVP, simulate payout
-        payout = {
-            "id": f"po_mock_{datetime.utcnow().timestamp()}",
-            "amount": int(payout_amount * 100),
-            "currency": "usd",
-            "status": "paid",
-            "arrival_date": datetime.utcnow().timestamp() + 86400  # Next day
-        }
-        
-        # In production, use actual Stripe:
-        # clipper = db.query(User).filter(User.id == submission.clipper_id).first()
-        # payout = stripe.Payout.create(
-        #     amount=int(payout_amount * 100),
-        #     currency='usd',
-        #     destination=clipper.stripe_account_id,  # Would need to be set up
-        #     metadata={
-        #         'submission_id': submission_id,
-        #         'base_pay': base_pay,
-        #         'bonus': bonus,
-        #         'platform_fee': platform_fee
-        #     }
-        # )
-        
-        return {
-            "payout_id": payout["id"],
-            "amount": payout_amount,
-            "base_pay": base_pay,
-            "bonus": bonus,
-            "platform_fee": platform_fee,
-            "status": payout["status"],
-            "message": "Payout processed successfully"
-        }
-        
-    except Exception as e:
+    # Pay through the ledger so repeated calls never pay twice
+    run = run_payouts(db, submission_ids=[submission_id], concurrency=1)
+    payout = db.query(Payout).filter(Payout.submission_id == submission_id).first()
+    
+    if payout.status == "failed":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Payout failed: {str(e)}"
+            detail=f"Payout failed: {payout.error}"
+        )
+    if payout.status == "pending":
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Payout not confirmed by the provider, retry later: {payout.error}"
         )
+    
+    return {
+        "payout_id": payout.provider_payout_id,
+        "amount": payout.amount,
+        "base_pay": payout.base_pay,
+        "bonus": payout.bonus,
+        "platform_fee": payout.platform_fee,
+        "status": payout.status,
+        "message": "Payout processed successfully" if run["processed"] else "Payout already processed"
+    }
+
+@router.post("/payouts/run")
+def run_business_payouts(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("business_local"))
+):
+    """Pay out every approved, unpaid submission on the business's gigs"""
+    return run_payouts(db, business_id=current_user.id)
 
 @router.post("/approve-submission/{submission_id}")
 def approve_submission(
@@ -183,76 +169,45 @@ def get_balance(
     """Get user's balance and earnings summary"""
     
     if current_user.role == "business_local":
-        # Business balance: credits earned
-        from ..models import Credit
-        credits = db.query(Credit).filter(Credit.user_id == current_user.id).all()
-        total_credits = sum(credit.amount for credit in credits)
-        
-        # Total spent on gigs
-        gigs = db.query(Gig).filter(Gig.business_id == current_user.id).all()
-        total_spent = sum(gig.budget for gig in gigs)
+        # Business balance: credits earned and total spent on gigs
+        rollup = get_user_rollup(db, current_user.id)
         
         return {
             "role": "business_local",
-            "credits_balance": total_credits,
-            "total_spent": total_spent,
-            "active_gigs": len([g for g in gigs if g.status in ["pending", "claimed"]])
+            "credits_balance": get_credit_balance(db, current_user.id),
+            "total_spent": rollup.total_spent,
+            "active_gigs": rollup.gigs_active
         }
     
     else:  # clipper
         # Clipper earnings: approved submissions
-        submissions = db.query(Submission).filter(
-            Submission.clipper_id == current_user.id,
-            Submission.approved == True
-        ).all()
-        
-        total_earnings = 0
-        for submission in submissions:
-            base_pay = 100.0
-            bonus = submission.bonus
-            platform_fee = (base_pay + bonus) * CLIPPER_FEE_RATE
-            earnings = (base_pay + bonus) - platform_fee
-            total_earnings += earnings
+        earnings = get_clipper_earnings(db, current_user.id)
         
         return {
             "role": "clipper",
-            "total_earnings": total_earnings,
-            "completed_gigs": len(submissions),
-            "pending_approval": len([s for s in db.query(Submission).filter(
-                Submission.clipper_id == current_user.id,
-                Submission.approved == False
-            ).all()])
+            "total_earnings": earnings["total_earnings"],
+            "completed_gigs": earnings["completed_gigs"],
+            "pending_approval": earnings["pending_approval"]
         }
 
 @router.post("/webhook")
-def stripe_webhook(request: Dict[str, Any]):
-    """Handle Stripe webhooks (for production)"""
-    # For MVP, this is a placeholder
-    # In production, this would handle actual Stripe events
+async def stripe_webhook(request: Request, db=Depends(get_request_db)):
+    """Receive Stripe webhooks: verify, store and acknowledge, then process asynchronously"""
+    body = await request.body()
+    try:
+        payload = verify_webhook_signature(body, request.headers.get("stripe-signature"))
+    except InvalidWebhookSignature as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid webhook: {e}"
+        )
     
-    event_type = request.get("type", "unknown")
+    event_pk, event_id, object_id = await run_db(db, store_webhook_event, payload)
     
-    # Handle different event types
-    webhook_handlers = {
-        "payment_intent.succeeded": handle_payment_success,
-        "payout.paid": handle_payout_success,
-        "payment_intent.payment_failed": handle_payment_failure,
-    }
+    if event_pk is None:
+        # Stripe retried an event we already have
+        webhook_dispatcher.record_duplicate()
+        return {"status": "duplicate", "event_id": event_id}
     
-    handler = webhook_handlers.get(event_type)
-    if handler:
-        return handler(request.get("data", {}))
-    
-    return {"status": "event_ignored", "type": event_type}
-
-def handle_payment_success(data: Dict[str, Any]) -> Dict[str, str]:
-    """Handle successful payment"""
-    return {"status": "payment_processed"}
-
-def handle_payout_success(data: Dict[str, Any]) -> Dict[str, str]:
-    """Handle successful payout"""
-    return {"status": "payout_completed"}
-
-def handle_payment_failure(data: Dict[str, Any]) -> Dict[str, str]:
-    """Handle failed payment"""
-    return {"status": "payment_failed"} 
\ No newline at end of file
+    webhook_dispatcher.enqueue(event_pk, object_id)
+    return {"status": "queued", "event_id": event_id}
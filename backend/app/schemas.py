@@ -67,6 +67,14 @@ class SubmissionUpdate(BaseModel):
     likes: Optional[int] = None
     outcomes: Optional[int] = None
 
+class SubmissionMetricsRecord(SubmissionUpdate):
+    submission_id: int
+
+class BonusScenario(BaseModel):
+    views: int = Field(..., ge=0)
+    likes: int = Field(..., ge=0)
+    outcomes: int = Field(0, ge=0)
+
 class SubmissionResponse(SubmissionBase):
     id: int
     gig_id: int
@@ -94,6 +102,11 @@ class LessonResponse(LessonBase):
     class Config:
         from_attributes = True
 
+class QuizAttempt(BaseModel):
+    lesson_id: int
+    answers: List[int]
+    reference: Optional[str] = None  # caller's id for the attempt, echoed back
+
 # Certification schemas
 class CertificationResponse(BaseModel):
     id: int
@@ -0,0 +1,131 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, Any, Dict, Sequence
+from ..models import Submission
+
+if TYPE_CHECKING:
+    import numpy as np  # imported on first use; keeps numpy out of API startup
+
+# Minimum thresholds - must meet both
+MIN_VIEWS = 300
+MIN_LIKES = 30
+
+# Tiered rates: a value below BOUNDS[i] earns RATES[i], otherwise the last rate
+VIEW_TIER_BOUNDS = (500, 2000)
+VIEW_TIER_RATES = (0.005, 0.01, 0.015)
+LIKE_TIER_BOUNDS = (50, 200)
+LIKE_TIER_RATES = (0.03, 0.05, 0.07)
+
+ENGAGEMENT_WEIGHT = 0.7  # views + likes
+OUTCOME_RATE = 0.10  # per check-in or sale
+OUTCOME_WEIGHT = 0.3
+BONUS_CAP = 75.0
+
+def _tier_rate(value: int, bounds: Sequence[int], rates: Sequence[float]) -> float:
+    for bound, rate in zip(bounds, rates):
+        if value < bound:
+            return rate
+    return rates[-1]
+
+def calculate_bonus(views: int, likes: int, outcomes: int) -> float:
+    """Calculate pure performance bonus (no base pay)"""
+    if views < MIN_VIEWS or likes < MIN_LIKES:
+        return 0.0
+    
+    views_bonus = views * _tier_rate(views, VIEW_TIER_BOUNDS, VIEW_TIER_RATES)
+    likes_bonus = likes * _tier_rate(likes, LIKE_TIER_BOUNDS, LIKE_TIER_RATES)
+    engagement_bonus = (views_bonus + likes_bonus) * ENGAGEMENT_WEIGHT
+    outcome_bonus = outcomes * OUTCOME_RATE * OUTCOME_WEIGHT
+    
+    return min(engagement_bonus + outcome_bonus, BONUS_CAP)
+
+def get_bonus_breakdown(views: int, likes: int, outcomes: int) -> Dict[str, Any]:
+    """Get detailed breakdown of bonus calculation"""
+    breakdown = {
+        "views_bonus": 0.0,
+        "likes_bonus": 0.0,
+        "engagement_bonus": 0.0,
+        "outcomes_bonus": 0.0,
+        "total_before_cap": 0.0,
+        "cap_applied": False,
+        "final_bonus": 0.0
+    }
+    
+    if views < MIN_VIEWS or likes < MIN_LIKES:
+        return breakdown
+    
+    views_rate = _tier_rate(views, VIEW_TIER_BOUNDS, VIEW_TIER_RATES)
+    likes_rate = _tier_rate(likes, LIKE_TIER_BOUNDS, LIKE_TIER_RATES)
+    
+    breakdown["views_bonus"] = views * views_rate
+    breakdown["views_rate"] = f"${views_rate}/view"
+    breakdown["likes_bonus"] = likes * likes_rate
+    breakdown["likes_rate"] = f"${likes_rate}/like"
+    breakdown["engagement_bonus"] = (breakdown["views_bonus"] + breakdown["likes_bonus"]) * ENGAGEMENT_WEIGHT
+    breakdown["engagement_weight"] = ENGAGEMENT_WEIGHT
+    breakdown["outcomes_bonus"] = outcomes * OUTCOME_RATE * OUTCOME_WEIGHT
+    breakdown["outcomes_rate"] = f"${OUTCOME_RATE:.2f}/outcome ({OUTCOME_WEIGHT:.0%} weight)"
+    
+    breakdown["total_before_cap"] = breakdown["engagement_bonus"] + breakdown["outcomes_bonus"]
+    breakdown["cap_applied"] = breakdown["total_before_cap"] > BONUS_CAP
+    breakdown["final_bonus"] = min(breakdown["total_before_cap"], BONUS_CAP)
+    
+    return breakdown
+
+def calculate_bonus_components(views, likes, outcomes) -> Dict[str, "np.ndarray"]:
+    """Vectorized bonus breakdown for arrays of views, likes and outcomes"""
+    import numpy as np
+    views = np.asarray(views, dtype=np.int64)
+    likes = np.asarray(likes, dtype=np.int64)
+    outcomes = np.asarray(outcomes, dtype=np.int64)
+    
+    eligible = (views >= MIN_VIEWS) & (likes >= MIN_LIKES)
+    views_rate = np.asarray(VIEW_TIER_RATES)[np.searchsorted(VIEW_TIER_BOUNDS, views, side="right")]
+    likes_rate = np.asarray(LIKE_TIER_RATES)[np.searchsorted(LIKE_TIER_BOUNDS, likes, side="right")]
+    
+    views_bonus = np.where(eligible, views * views_rate, 0.0)
+    likes_bonus = np.where(eligible, likes * likes_rate, 0.0)
+    engagement_bonus = (views_bonus + likes_bonus) * ENGAGEMENT_WEIGHT
+    outcomes_bonus = np.where(eligible, outcomes * OUTCOME_RATE * OUTCOME_WEIGHT, 0.0)
+    total_before_cap = engagement_bonus + outcomes_bonus
+    
+    return {
+        "views_bonus": views_bonus,
+        "likes_bonus": likes_bonus,
+        "engagement_bonus": engagement_bonus,
+        "outcomes_bonus": outcomes_bonus,
+        "total_before_cap": total_before_cap,
+        "cap_applied": total_before_cap > BONUS_CAP,
+        "final_bonus": np.minimum(total_before_cap, BONUS_CAP)
+    }
+
+def calculate_bonuses(views, likes, outcomes) -> "np.ndarray":
+    """Vectorized calculate_bonus for arrays of views, likes and outcomes"""
+    return calculate_bonus_components(views, likes, outcomes)["final_bonus"]
+
+def recompute_submission_bonuses(db: Session, batch_size: int = 5000) -> int:
+    """Recompute and store the bonus of every submission; returns rows updated"""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.query(
+            Submission.id, Submission.views, Submission.likes, Submission.outcomes
+        ).filter(
+            Submission.id > last_id
+        ).order_by(Submission.id).limit(batch_size).all()
+        if not rows:
+            break
+        
+        ids, views, likes, outcomes = zip(*rows)
+        bonuses = calculate_bonuses(
+            [v or 0 for v in views], [l or 0 for l in likes], [o or 0 for o in outcomes]
+        )
+        db.execute(
+            update(Submission),
+            [{"id": submission_id, "bonus": float(bonus)} for submission_id, bonus in zip(ids, bonuses)]
+        )
+        db.commit()
+        
+        updated += len(rows)
+        last_id = ids[-1]
+    return updated
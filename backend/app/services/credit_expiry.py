@@ -0,0 +1,145 @@
+"""Periodic credit expiry sweep
+
+Credits past their expiry are flagged expired in batches walking the
+primary key range, and each user's rollup credits_expired total is bumped
+in the same transaction, so read paths never compare expiry with now.
+Every worker runs the sweeper; on PostgreSQL a sweep first takes a
+session advisory lock, so only one worker sweeps at a time and the others
+skip that run.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+from ..models import Credit
+from ..database import SessionLocal, engine
+from ..config import get_settings
+from .rollups import record_credits_expired
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key held while a sweep runs
+SWEEP_LOCK_KEY = 7042001
+
+def expire_credits(db: Session, batch_size: int = 1000, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Mark due credits expired, one committed batch per id range; returns counters"""
+    now = now or datetime.utcnow()
+    due = (Credit.expired == False, Credit.expiry <= now)
+    result = {"batches": 0, "credits_expired": 0, "amount_expired": 0.0}
+
+    low, high = db.query(func.min(Credit.id), func.max(Credit.id)).filter(*due).one()
+    if low is None:
+        return result
+
+    for start in range(low, high + 1, batch_size):
+        # RETURNING reports only the rows this sweep flipped, so concurrent
+        # sweeps can't count the same credit twice
+        rows = db.execute(
+            update(Credit)
+            .where(Credit.id >= start, Credit.id < start + batch_size, *due)
+            .values(expired=True)
+            .returning(Credit.user_id, Credit.amount)
+        ).all()
+
+        totals: Dict[int, float] = defaultdict(float)
+        for user_id, amount in rows:
+            totals[user_id] += amount
+        for user_id, amount in totals.items():
+            record_credits_expired(db, user_id, amount)
+        db.commit()
+
+        result["batches"] += 1
+        result["credits_expired"] += len(rows)
+        result["amount_expired"] += sum(totals.values())
+
+    return result
+
+class CreditExpirySweeper:
+    """Runs expire_credits on an interval from the event loop"""
+
+    def __init__(self, interval: float = 300, batch_size: int = 1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {
+            "runs": 0,
+            "batches": 0,
+            "credits_expired": 0,
+            "amount_expired": 0.0,
+            "errors": 0,
+            "skipped": 0,
+            "last_run_at": None,
+            "last_run_seconds": None
+        }
+
+    def start(self):
+        """Start sweeping on the running event loop (no-op if disabled)"""
+        if self.interval <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the sweep loop"""
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def sweep(self) -> Optional[Dict[str, Any]]:
+        """Run one sweep in its own session and record its counters
+        
+        Returns None without sweeping if another worker holds the sweep lock.
+        """
+        started = time.monotonic()
+        lock = engine.connect() if engine.dialect.name == "postgresql" else None
+        try:
+            if lock is not None and not lock.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": SWEEP_LOCK_KEY}):
+                self._counters["skipped"] += 1
+                return None
+            db = SessionLocal()
+            try:
+                result = expire_credits(db, self.batch_size)
+            except Exception:
+                self._counters["errors"] += 1
+                raise
+            finally:
+                db.close()
+                if lock is not None:
+                    # Session-level lock: it outlives the transaction and the
+                    # pooled connection, so release it explicitly
+                    lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SWEEP_LOCK_KEY})
+                    lock.commit()
+        finally:
+            if lock is not None:
+                lock.close()
+        self._counters["runs"] += 1
+        for key, value in result.items():
+            self._counters[key] += value
+        self._counters["last_run_at"] = datetime.utcnow().isoformat()
+        self._counters["last_run_seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Sweep counters"""
+        return dict(self._counters)
+
+    async def _run(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                if result and result["credits_expired"]:
+                    logger.info("Expired %d credits in %d batches", result["credits_expired"], result["batches"])
+            except Exception:
+                logger.exception("Credit expiry sweep failed")
+            await asyncio.sleep(self.interval)
+
+credit_expiry_sweeper = CreditExpirySweeper(
+    interval=settings.credit_expiry_sweep_interval,
+    batch_size=settings.credit_expiry_batch_size
+)
@@ -0,0 +1,53 @@
+"""Credit ledger: issuing credits and balance lookups
+
+Issued and expired totals are kept in the user's rollup (expiry is applied
+in batches by services.credit_expiry), so balances are a single row read.
+"""
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..models import Credit
+from ..config import get_settings
+from .rollups import get_user_rollup, record_credit_issued
+
+settings = get_settings()
+
+def issue_credit(db: Session, user_id: int, amount: float, source: str) -> Credit:
+    """Add a credit with the standard expiry (committed by the caller)"""
+    credit = Credit(
+        user_id=user_id,
+        amount=amount,
+        source=source,
+        expiry=datetime.utcnow() + timedelta(days=30 * settings.credit_expiry_months)
+    )
+    db.add(credit)
+    record_credit_issued(db, user_id, amount)
+    return credit
+
+def get_credit_totals(db: Session, user_id: int) -> Tuple[float, float]:
+    """Return (active, expired) credit totals for a user"""
+    # Expiry is applied by services.credit_expiry; reads only use the rollup
+    rollup = get_user_rollup(db, user_id)
+    return round(rollup.credits_issued - rollup.credits_expired, 2), rollup.credits_expired
+
+def get_credit_balance(db: Session, user_id: int) -> float:
+    """Get the user's spendable (non-expired) credit balance"""
+    return get_credit_totals(db, user_id)[0]
+
+def get_active_credits(db: Session, user_id: int) -> List[Credit]:
+    """Get the user's credits not yet expired by the sweeper"""
+    return db.query(Credit).filter(
+        Credit.user_id == user_id,
+        Credit.expired == False
+    ).all()
+
+def get_recent_credit_total(db: Session, user_id: int, source: str, days: int) -> float:
+    """Sum the credits from one source issued in the last `days` days"""
+    since = datetime.utcnow() - timedelta(days=days)
+    total = db.query(func.coalesce(func.sum(Credit.amount), 0.0)).filter(
+        Credit.user_id == user_id,
+        Credit.source == source,
+        Credit.created_at >= since
+    ).scalar()
+    return float(total)
@@ -1,52 +1,244 @@
-import boto3
-from typing import List
-from botocore.exceptions import ClientError
+import asyncio
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from ..config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-# Initialize SES client
-ses_client = boto3.client(
-    'ses',
-    aws_access_key_id=settings.aws_access_key_id,
-    aws_secret_access_key=settings.aws_secret_access_key,
-    region_name=settings.ses_region
-)
+_ses_client = None
+_ses_lock = threading.Lock()
 
-async def send_email(
-    to_emails: List[str],
-    subject: str,
-    html_body: str,
-    text_body: str = None
-):
-    """Send email via AWS SES"""
-    try:
-        response = ses_client.send_email(
+def get_ses_client():
+    """Shared per-process SES client; boto3 is imported and the client built on first use"""
+    global _ses_client
+    if _ses_client is None:
+        with _ses_lock:
+            if _ses_client is None:
+                import boto3
+                _ses_client = boto3.client(
+                    'ses',
+                    aws_access_key_id=settings.aws_access_key_id,
+                    aws_secret_access_key=settings.aws_secret_access_key,
+                    region_name=settings.ses_region
+                )
+    return _ses_client
+
+@dataclass
+class EmailMessage:
+    """A single outgoing email"""
+    to_emails: List[str]
+    subject: str
+    html_body: str
+    text_body: Optional[str] = None
+    attempts: int = 0
+
+class SESTransport:
+    """Deliver emails through AWS SES"""
+    
+    def send(self, message: EmailMessage) -> str:
+        response = get_ses_client().send_email(
             Source=settings.from_email,
             Destination={
-                'ToAddresses': to_emails,
+                'ToAddresses': message.to_emails,
             },
             Message={
                 'Subject': {
-                    'Data': subject,
+                    'Data': message.subject,
                     'Charset': 'UTF-8'
                 },
                 'Body': {
                     'Html': {
-                        'Data': html_body,
+                        'Data': message.html_body,
                         'Charset': 'UTF-8'
                     },
                     'Text': {
-                        'Data': text_body or html_body,
+                        'Data': message.text_body or message.html_body,
                         'Charset': 'UTF-8'
                     }
                 }
             }
         )
         return response['MessageId']
-    except ClientError as e:
-        print(f"Email sending failed: {e.response['Error']['Message']}")
-        return None
+
+class LocalTransport:
+    """Keep delivered emails in memory (local development and tests)"""
+    
+    def __init__(self):
+        self.outbox: List[EmailMessage] = []
+    
+    def send(self, message: EmailMessage) -> str:
+        self.outbox.append(message)
+        return f"local-{len(self.outbox)}"
+
+def build_transport(backend: str):
+    """Build the email transport selected in settings"""
+    if backend == "local":
+        return LocalTransport()
+    return SESTransport()
+
+class EmailDispatcher:
+    """Bounded in-process email queue drained by a pool of async workers
+    
+    A worker takes up to batch_size queued messages per wake-up and delivers
+    them in one trip off the event loop; each message is still its own
+    provider call (SES SendEmail). Failures are retried with exponential
+    backoff and dropped after max_retries.
+    
+    enqueue may be called from the event loop or from any other thread
+    (sync handlers, background tasks). Without a started dispatcher, e.g.
+    in manage.py commands, messages are delivered inline.
+    """
+    
+    def __init__(
+        self,
+        transport,
+        queue_size: int = 1000,
+        workers: int = 4,
+        batch_size: int = 10,
+        max_retries: int = 5,
+        retry_base_delay: float = 1.0
+    ):
+        self.transport = transport
+        self.queue_size = queue_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._counters = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+    
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self, timeout: float = 10.0):
+        """Drain queued emails (up to timeout) and stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Email queue not drained on shutdown: %d pending", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+    
+    def enqueue(self, message: EmailMessage) -> bool:
+        """Queue an email for delivery; returns False if it was dropped
+        
+        Off the event loop the message is handed over thread-safely and
+        True means it was accepted for queueing.
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is not None and (self._loop is running_loop or not self._is_running()):
+            self.start()
+            return self._put(message)
+        if self._is_running():
+            self._loop.call_soon_threadsafe(self._put, message)
+            return True
+        
+        # No dispatcher running (e.g. a manage.py command): deliver inline
+        failures = self._deliver_batch([message])
+        if failures:
+            self._counters["failed"] += 1
+            logger.error("Email sending failed: %s", failures[0][1])
+            return False
+        self._counters["sent"] += 1
+        return True
+    
+    def _is_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running() and bool(self._tasks)
+    
+    def _put(self, message: EmailMessage) -> bool:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            logger.error("Email queue full, dropping email: %s", message.subject)
+            return False
+        self._counters["queued"] += 1
+        return True
+    
+    def stats(self) -> Dict[str, int]:
+        """Delivery counters and current queue depth"""
+        return {**self._counters, "queue_depth": self._queue.qsize() if self._queue else 0}
+    
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                failures = await asyncio.to_thread(self._deliver_batch, batch)
+                self._counters["sent"] += len(batch) - len(failures)
+                for message, error in failures:
+                    self._retry(message, error)
+            except Exception:
+                logger.exception("Email worker failed to deliver a batch")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _deliver_batch(self, batch: List[EmailMessage]) -> List[Tuple[EmailMessage, Exception]]:
+        failures = []
+        for message in batch:
+            try:
+                self.transport.send(message)
+            except Exception as e:
+                failures.append((message, e))
+        return failures
+    
+    def _retry(self, message: EmailMessage, error: Exception):
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            self._counters["failed"] += 1
+            logger.error("Email sending failed after %d attempts: %s", message.attempts, error)
+            return
+        self._counters["retried"] += 1
+        delay = self.retry_base_delay * (2 ** (message.attempts - 1)) * random.uniform(0.5, 1.5)
+        self._loop.call_later(delay, self._requeue, message)
+    
+    def _requeue(self, message: EmailMessage):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            logger.error("Email queue full, dropping retry: %s", message.subject)
+
+email_dispatcher = EmailDispatcher(
+    build_transport(settings.email_backend),
+    queue_size=settings.email_queue_size,
+    workers=settings.email_workers,
+    batch_size=settings.email_batch_size,
+    max_retries=settings.email_max_retries,
+    retry_base_delay=settings.email_retry_base_delay
+)
+
+async def send_email(
+    to_emails: List[str],
+    subject: str,
+    html_body: str,
+    text_body: str = None
+) -> bool:
+    """Queue an email for background delivery"""
+    return email_dispatcher.enqueue(EmailMessage(to_emails, subject, html_body, text_body))
 
 async def send_gig_claimed_notification(business_email: str, gig_title: str, clipper_email: str):
     """Notify business when their gig is claimed"""
@@ -1,84 +1,143 @@
-import boto3
-import uuid
+import asyncio
+import hashlib
 import magic
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from fastapi import HTTPException, UploadFile
-from PIL import Image
-import io
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 import os
 from ..config import get_settings
+from ..database import run_db
+from ..models import StoredFile
+from .storage import storage
+from .thumbnails import get_thumbnails
 
 settings = get_settings()
 
-# Initialize S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=settings.aws_access_key_id,
-    aws_secret_access_key=settings.aws_secret_access_key,
-    region_name=settings.aws_region
-)
+# Blocking storage calls run here instead of on the event loop
+upload_executor = ThreadPoolExecutor(max_workers=settings.upload_workers, thread_name_prefix="upload")
 
-async def upload_video_to_s3(file: UploadFile, folder: str = "videos") -> str:
-    """Upload video file to S3 and return the URL"""
+async def _run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(upload_executor, func, *args)
+
+def find_stored_file(db: Session, folder: str, content_hash: str) -> Optional[StoredFile]:
+    """Look up a file previously stored in a folder by its SHA-256 content hash"""
+    return db.query(StoredFile).filter(
+        StoredFile.folder == folder,
+        StoredFile.content_hash == content_hash
+    ).first()
+
+def record_stored_file(db: Session, folder: str, content_hash: str, key: str, url: str, size: int, content_type: str) -> str:
+    """Record an uploaded file by folder and content hash and return its canonical URL"""
+    db.add(StoredFile(
+        folder=folder,
+        content_hash=content_hash,
+        key=key,
+        url=url,
+        size=size,
+        content_type=content_type
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same content won the race
+        db.rollback()
+        return find_stored_file(db, folder, content_hash).url
+    return url
+
+async def upload_video_to_s3(file: UploadFile, folder: str = "videos", db=None) -> str:
+    """Upload a video file to storage and return the URL
     
-    # Validate file size
-    contents = await file.read()
-    if len(contents) > settings.max_file_size:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {settings.max_file_size / 1024 / 1024:.0f}MB"
-        )
+    Files are stored under a content-addressed key; when a database session
+    (sync or async) is given, re-uploads of identical content to the same
+    folder return the existing URL. The request body size is already capped while it streams
+    in by middleware.UploadSizeLimitMiddleware; the check here applies the
+    exact limit to the file itself.
+    """
     
-    # Validate file type
-    file_type = magic.from_buffer(contents, mime=True)
+    # First pass over the spooled upload: validate type and size, hash contents
+    chunk = await file.read(settings.upload_chunk_size)
+    file_type = magic.from_buffer(chunk, mime=True)
     if file_type not in settings.allowed_video_types:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed types: {', '.join(settings.allowed_video_types)}"
         )
     
-    # Generate unique filename
+    hasher = hashlib.sha256()
+    total_size = 0
+    while chunk:
+        total_size += len(chunk)
+        if total_size > settings.max_file_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size is {settings.max_file_size / 1024 / 1024:.0f}MB"
+            )
+        await _run_blocking(hasher.update, chunk)
+        chunk = await file.read(settings.upload_chunk_size)
+    content_hash = hasher.hexdigest()
+    
+    # Identical content was already stored in this folder
+    if db is not None:
+        stored_file = await run_db(db, find_stored_file, folder, content_hash)
+        if stored_file:
+            return stored_file.url
+    
+    # Content-addressed filename
     file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{folder}/{uuid.uuid4()}{file_extension}"
+    key = f"{folder}/{content_hash}{file_extension}"
     
+    # Second pass: stream the file to storage in parts
+    await file.seek(0)
     try:
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=settings.s3_bucket_name,
-            Key=unique_filename,
-            Body=contents,
-            ContentType=file_type,
-            Metadata={
+        upload_id = await _run_blocking(
+            storage.start_upload,
+            key,
+            file_type,
+            {
                 'original-filename': file.filename,
-                'uploaded-by': 'mx70-platform'
+                'uploaded-by': 'mx70-platform',
+                'sha256': content_hash
             }
         )
-        
-        # Return S3 URL
-        return f"https://{settings.s3_bucket_name}.s3.{settings.aws_region}.amazonaws.com/{unique_filename}"
-        
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to upload file: {str(e)}"
         )
+    
+    parts = []
+    try:
+        chunk = await file.read(settings.upload_part_size)
+        while chunk or not parts:
+            parts.append(await _run_blocking(storage.upload_part, key, upload_id, len(parts) + 1, chunk))
+            chunk = await file.read(settings.upload_part_size)
+        await _run_blocking(storage.complete_upload, key, upload_id, parts)
+    except Exception as e:
+        await _run_blocking(storage.abort_upload, key, upload_id)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to upload file: {str(e)}"
+        )
+    
+    url = storage.url_for(key)
+    
+    # Record the content hash so later uploads short-circuit
+    if db is not None:
+        return await run_db(db, record_stored_file, folder, content_hash, key, url, total_size, file_type)
+    
+    return url
 
 async def generate_video_thumbnail(video_url: str) -> Optional[str]:
-    """Generate thumbnail for video (stub for MVP)"""
-    # In production, this would use FFmpeg or similar to extract a frame
-    # For MVP, we'll return a placeholder
-    return f"{video_url}_thumbnail.jpg"
+    """Return the small thumbnail URL for an uploaded video, rendering it on first use"""
+    thumbnail_urls = await get_thumbnails(video_url)
+    return thumbnail_urls["small"] if thumbnail_urls else None
 
 def delete_file_from_s3(file_url: str) -> bool:
-    """Delete file from S3"""
+    """Delete file from storage"""
     try:
-        # Extract key from URL
-        key = file_url.split(f"{settings.s3_bucket_name}.s3.{settings.aws_region}.amazonaws.com/")[1]
-        
-        s3_client.delete_object(
-            Bucket=settings.s3_bucket_name,
-            Key=key
-        )
+        storage.delete(storage.key_for(file_url))
         return True
     except Exception:
-        return False 
\ No newline at end of file
+        return False
@@ -0,0 +1,219 @@
+"""Lesson catalog loaded once from the lessons table
+
+The catalog is an immutable snapshot: the lesson list pre-serialized to JSON
+bytes (and gzip) with a content ETag, an id index and compiled quiz answer
+keys. It is rebuilt lazily after any commit in this process that inserts,
+updates or deletes a Lesson, and after settings.lesson_catalog_ttl seconds
+so changes made by other workers are picked up. Lessons are seeded by
+`python -m app.manage seed-lessons`, never by a read.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..models import Lesson
+from ..schemas import LessonResponse
+from ..config import get_settings
+
+if TYPE_CHECKING:
+    import numpy as np  # imported when the catalog is first loaded
+
+settings = get_settings()
+
+# Seed lessons, inserted by seed_lessons when the lessons table is empty
+SAMPLE_LESSONS = [
+    {
+        "title": "Creating Compelling Content",
+        "content": """
+        Learn how to create engaging content that drives results:
+        
+        1. Hook viewers in the first 3 seconds
+        2. Show the problem and solution clearly
+        3. Use dynamic camera movements
+        4. Include strong call-to-actions
+        5. Optimize for mobile viewing
+        
+        Video tutorial: https://example.com/lesson1
+        """,
+        "quiz": {
+            "questions": [
+                {
+                    "question": "How long do you have to hook viewers?",
+                    "options": ["1 second", "3 seconds", "5 seconds", "10 seconds"],
+                    "correct": 1
+                },
+                {
+                    "question": "What's most important for mobile optimization?",
+                    "options": ["High resolution", "Vertical format", "Long duration", "Complex editing"],
+                    "correct": 1
+                },
+                {
+                    "question": "A strong call-to-action should be:",
+                    "options": ["Subtle", "At the end only", "Clear and direct", "Optional"],
+                    "correct": 2
+                }
+            ]
+        }
+    },
+    {
+        "title": "Performance Metrics That Matter",
+        "content": """
+        Understanding key metrics for success:
+        
+        1. View completion rates vs raw views
+        2. Engagement depth (likes, comments, shares)
+        3. Conversion tracking through outcomes
+        4. Time-of-day posting optimization
+        5. Hashtag strategy for discoverability
+        
+        Video tutorial: https://example.com/lesson2
+        """,
+        "quiz": {
+            "questions": [
+                {
+                    "question": "Which metric indicates content quality best?",
+                    "options": ["Total views", "View completion rate", "Number of hashtags", "Video length"],
+                    "correct": 1
+                },
+                {
+                    "question": "When should you track outcomes?",
+                    "options": ["Only after 1000 views", "Within 24 hours", "Throughout the campaign", "Never"],
+                    "correct": 2
+                },
+                {
+                    "question": "Optimal posting time depends on:",
+                    "options": ["Your schedule", "Target audience behavior", "Platform algorithm", "Video length"],
+                    "correct": 1
+                }
+            ]
+        }
+    }
+]
+
+PASSING_SCORE = 70  # percent
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    lessons: Tuple[LessonResponse, ...]
+    by_id: Mapping[int, LessonResponse]
+    answer_keys: Mapping[int, "np.ndarray"]  # correct option index per question
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    loaded_at: float  # time.monotonic() when loaded
+
+@dataclass(frozen=True)
+class QuizGrade:
+    lesson_id: int
+    score: float
+    passed: bool
+    correct_answers: int
+    total_questions: int
+
+def compile_answer_key(quiz: Optional[Dict[str, Any]]) -> "np.ndarray":
+    """Compile a quiz's questions into an array of correct option indices"""
+    import numpy as np
+    questions = (quiz or {}).get("questions", [])
+    key = np.array([question["correct"] for question in questions], dtype=np.int64)
+    key.setflags(write=False)
+    return key
+
+def _grade(lesson_id: int, correct: int, total: int) -> QuizGrade:
+    score = (correct / total) * 100 if total else 0.0
+    return QuizGrade(
+        lesson_id=lesson_id,
+        score=score,
+        passed=score >= PASSING_SCORE,
+        correct_answers=correct,
+        total_questions=total
+    )
+
+def grade_quiz(key: "np.ndarray", lesson_id: int, answers: Sequence[Any]) -> QuizGrade:
+    """Grade one attempt against a compiled answer key"""
+    correct = sum(1 for given, expected in zip(answers, key.tolist()) if given == expected)
+    return _grade(lesson_id, correct, len(key))
+
+def grade_attempts(key: "np.ndarray", lesson_id: int, attempts: Sequence[Sequence[int]]) -> List[QuizGrade]:
+    """Grade many full-length attempts at the same quiz in one vectorized pass"""
+    import numpy as np
+    if not attempts:
+        return []
+    answers = np.asarray(attempts, dtype=np.int64).reshape(len(attempts), len(key))
+    correct = (answers == key).sum(axis=1)
+    return [_grade(lesson_id, int(count), len(key)) for count in correct]
+
+class LessonCatalog:
+    """Process-wide cache of the encoded lesson catalog"""
+    
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+    
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return snapshot is not None and (self.ttl <= 0 or time.monotonic() - snapshot.loaded_at < self.ttl)
+    
+    def get(self, db: Session) -> CatalogSnapshot:
+        """Return the current snapshot, loading it on first use or once it is older than the TTL"""
+        snapshot = self._snapshot
+        if not self._is_fresh(snapshot):
+            with self._lock:
+                snapshot = self._snapshot
+                if not self._is_fresh(snapshot):
+                    snapshot = self._snapshot = self._load(db)
+        return snapshot
+    
+    def invalidate(self):
+        """Drop the snapshot; the next request reloads it"""
+        self._snapshot = None
+    
+    def _load(self, db: Session) -> CatalogSnapshot:
+        rows = db.query(Lesson).order_by(Lesson.id).all()
+        lessons = tuple(LessonResponse.from_orm(row) for row in rows)
+        body = json.dumps(
+            jsonable_encoder([lesson.dict() for lesson in lessons]),
+            separators=(",", ":")
+        ).encode()
+        return CatalogSnapshot(
+            lessons=lessons,
+            by_id=MappingProxyType({lesson.id: lesson for lesson in lessons}),
+            answer_keys=MappingProxyType({lesson.id: compile_answer_key(lesson.quiz) for lesson in lessons}),
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            loaded_at=time.monotonic()
+        )
+
+def seed_lessons(db: Session) -> int:
+    """Insert SAMPLE_LESSONS if the lessons table is empty; returns lessons added"""
+    if db.query(Lesson.id).first() is not None:
+        return 0
+    db.add_all(Lesson(**lesson) for lesson in SAMPLE_LESSONS)
+    db.commit()
+    return len(SAMPLE_LESSONS)
+
+lesson_catalog = LessonCatalog(ttl=settings.lesson_catalog_ttl)
+
+@event.listens_for(Lesson, "after_insert")
+@event.listens_for(Lesson, "after_update")
+@event.listens_for(Lesson, "after_delete")
+def _mark_lessons_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["lessons_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_on_commit(session):
+    if session.info.pop("lessons_changed", False):
+        lesson_catalog.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _clear_lessons_changed(session):
+    session.info.pop("lessons_changed", None)
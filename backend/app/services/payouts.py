@@ -0,0 +1,263 @@
+"""Batch payouts for approved submissions
+
+A run selects approved submissions that have not been paid, computes every
+amount in one pass and writes pending rows to the payout ledger before
+anything is sent. Payouts are then submitted to the provider concurrently,
+each with an idempotency key. A payout whose outcome is unknown (timeout,
+connection error, crash) stays pending and is retried with the same key,
+so the provider returns the original payout instead of paying twice. A
+payout the provider definitely rejected is marked failed; the provider
+replays a stored rejection for the same key, so the next run retries it
+under a new key, payout-submission-{id}-{attempts}.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import Gig, Payout, Submission
+from ..config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+BASE_PAY = 100.0  # Base $100 payment per approved submission
+CLIPPER_FEE_RATE = 0.12   # 12% average (10-15%)
+
+# Ledger rows in these states are not sent again
+SETTLED_STATUSES = ("submitted", "paid")
+
+def compute_payout(bonus: Optional[float]) -> Dict[str, float]:
+    """Split a submission's earnings into base pay, bonus, fee and payout amount"""
+    bonus = bonus or 0.0
+    total_earnings = BASE_PAY + bonus
+    platform_fee = total_earnings * CLIPPER_FEE_RATE
+    return {
+        "base_pay": BASE_PAY,
+        "bonus": bonus,
+        "platform_fee": platform_fee,
+        "amount": total_earnings - platform_fee
+    }
+
+def get_clipper_earnings(db: Session, clipper_id: int) -> Dict[str, Any]:
+    """Summarize a clipper's submissions and approved earnings in one aggregate"""
+    approved = Submission.approved == True
+    row = db.query(
+        func.count(Submission.id),
+        func.count(Submission.id).filter(approved),
+        func.count(Submission.id).filter(Submission.approved == False),
+        func.coalesce(func.sum(Submission.bonus).filter(approved), 0.0),
+        func.coalesce(func.sum(Submission.views), 0),
+        func.coalesce(func.sum(Submission.likes), 0),
+        func.coalesce(func.sum(Submission.outcomes), 0)
+    ).filter(Submission.clipper_id == clipper_id).one()
+    total, completed, pending, bonuses, views, likes, outcomes = row
+
+    gross = completed * BASE_PAY + bonuses
+    return {
+        "total_gigs": total,
+        "completed_gigs": completed,
+        "pending_approval": pending,
+        "total_earnings": gross - gross * CLIPPER_FEE_RATE,
+        "total_bonuses": bonuses,
+        "total_views": views,
+        "total_likes": likes,
+        "total_outcomes": outcomes
+    }
+
+class PayoutRejected(Exception):
+    """The provider definitely did not pay; safe to retry under a new idempotency key"""
+
+def idempotency_key_for(submission_id: int, attempt: int = 0) -> str:
+    """Idempotency key for a submission's payout, per attempt after a definite failure"""
+    key = f"payout-submission-{submission_id}"
+    return f"{key}-{attempt}" if attempt else key
+
+class MockPayoutProvider:
+    """In-process payout provider for development; idempotent per key"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._payouts: Dict[str, Dict[str, Any]] = {}
+
+    def create_payout(self, amount_cents: int, idempotency_key: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            payout = self._payouts.get(idempotency_key)
+            if payout is None:
+                payout = self._payouts[idempotency_key] = {
+                    "id": f"po_mock_{uuid.uuid4().hex[:16]}",
+                    "amount": amount_cents,
+                    "currency": "usd",
+                    "status": "paid",
+                    "arrival_date": time.time() + 86400,  # Next day
+                    "metadata": metadata
+                }
+            return payout
+
+class StripePayoutProvider:
+    """Stripe payouts; Stripe dedupes requests by idempotency key"""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def create_payout(self, amount_cents: int, idempotency_key: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        import stripe
+        try:
+            # destination requires clipper Stripe accounts, which are not set up yet
+            return stripe.Payout.create(
+                amount=amount_cents,
+                currency="usd",
+                metadata=metadata,
+                idempotency_key=idempotency_key,
+                api_key=self.api_key
+            )
+        except (stripe.error.CardError, stripe.error.InvalidRequestError) as e:
+            # Stripe answered and refused; connection errors, rate limits and
+            # 5xx responses leave the outcome unknown and propagate
+            raise PayoutRejected(str(e)) from e
+
+def build_payout_provider(backend: str):
+    """Build the payout provider selected in settings"""
+    if backend == "stripe":
+        return StripePayoutProvider(settings.stripe_secret_key)
+    return MockPayoutProvider()
+
+payout_provider = build_payout_provider(settings.payout_backend)
+
+def _ledger_entry(payout: Payout) -> Dict[str, Any]:
+    return {
+        "id": payout.id,
+        "submission_id": payout.submission_id,
+        "business_id": payout.business_id,
+        "clipper_id": payout.clipper_id,
+        "base_pay": payout.base_pay,
+        "bonus": payout.bonus,
+        "platform_fee": payout.platform_fee,
+        "amount": payout.amount,
+        "idempotency_key": payout.idempotency_key,
+        "attempts": payout.attempts or 0
+    }
+
+def prepare_payouts(
+    db: Session,
+    business_id: Optional[int] = None,
+    submission_ids: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """Record pending ledger rows for approved, unpaid submissions; returns the entries to submit"""
+    query = db.query(Submission.id, Submission.clipper_id, Submission.bonus, Gig.business_id, Payout).join(
+        Gig, Submission.gig_id == Gig.id
+    ).outerjoin(
+        Payout, Payout.submission_id == Submission.id
+    ).filter(
+        Submission.approved == True,
+        or_(Payout.id == None, Payout.status.notin_(SETTLED_STATUSES))
+    )
+    if business_id is not None:
+        query = query.filter(Gig.business_id == business_id)
+    if submission_ids is not None:
+        query = query.filter(Submission.id.in_(submission_ids))
+
+    payouts = []
+    for row in query.order_by(Submission.id).all():
+        payout = row.Payout
+        if payout is not None and payout.status == "failed":
+            # The provider stored the rejection under the old key; retry under a new one
+            payout.idempotency_key = idempotency_key_for(row.id, payout.attempts)
+            payout.status = "pending"
+        elif payout is None:
+            # Amounts are fixed when the ledger row is created; retries reuse them
+            payout = Payout(
+                submission_id=row.id,
+                business_id=row.business_id,
+                clipper_id=row.clipper_id,
+                idempotency_key=idempotency_key_for(row.id),
+                status="pending",
+                attempts=0,
+                **compute_payout(row.bonus)
+            )
+            db.add(payout)
+        payouts.append(payout)
+
+    try:
+        db.flush()
+        entries = [_ledger_entry(payout) for payout in payouts]
+        db.commit()
+    except IntegrityError:
+        # A concurrent run created some of these rows; pick them up instead
+        db.rollback()
+        return prepare_payouts(db, business_id, submission_ids)
+    return entries
+
+def submit_payouts(entries: List[Dict[str, Any]], provider=None, concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Send ledger entries to the provider concurrently; returns ledger updates"""
+    provider = provider or payout_provider
+
+    def submit(entry: Dict[str, Any]) -> Dict[str, Any]:
+        outcome = {"id": entry["id"], "attempts": entry["attempts"] + 1}
+        try:
+            result = provider.create_payout(
+                int(round(entry["amount"] * 100)),  # Convert to cents
+                entry["idempotency_key"],
+                {
+                    "submission_id": entry["submission_id"],
+                    "base_pay": entry["base_pay"],
+                    "bonus": entry["bonus"],
+                    "platform_fee": entry["platform_fee"]
+                }
+            )
+        except PayoutRejected as e:
+            logger.warning("Payout for submission %s was rejected: %s", entry["submission_id"], e)
+            return {**outcome, "status": "failed", "provider_payout_id": None, "error": str(e)}
+        except Exception as e:
+            # The provider may have paid; stay pending so the next run reuses the key
+            logger.warning("Payout for submission %s has an unknown outcome: %s", entry["submission_id"], e)
+            return {**outcome, "status": "pending", "provider_payout_id": None, "error": str(e)}
+
+        provider_status = result["status"]
+        if provider_status in ("failed", "canceled"):
+            return {**outcome, "status": "failed", "provider_payout_id": result["id"], "error": f"Provider status {provider_status}"}
+        return {
+            **outcome,
+            "status": "paid" if provider_status == "paid" else "submitted",
+            "provider_payout_id": result["id"],
+            "error": None
+        }
+
+    if not entries:
+        return []
+    workers = max(1, min(concurrency or settings.payout_concurrency, len(entries)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payout") as pool:
+        return list(pool.map(submit, entries))
+
+def run_payouts(
+    db: Session,
+    business_id: Optional[int] = None,
+    submission_ids: Optional[List[int]] = None,
+    provider=None,
+    concurrency: Optional[int] = None
+) -> Dict[str, Any]:
+    """Pay every approved, unpaid submission (for one business, or platform-wide)"""
+    entries = prepare_payouts(db, business_id, submission_ids)
+    outcomes = submit_payouts(entries, provider, concurrency)
+
+    if outcomes:
+        db.execute(update(Payout), outcomes)
+        db.commit()
+
+    payouts = [{**entry, **outcome} for entry, outcome in zip(entries, outcomes)]
+    succeeded = [payout for payout in payouts if payout["status"] in SETTLED_STATUSES]
+    return {
+        "processed": len(payouts),
+        "succeeded": len(succeeded),
+        "failed": sum(1 for payout in payouts if payout["status"] == "failed"),
+        "pending": sum(1 for payout in payouts if payout["status"] == "pending"),
+        "total_amount": sum(payout["amount"] for payout in succeeded),
+        "payouts": payouts
+    }
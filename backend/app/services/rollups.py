@@ -0,0 +1,212 @@
+"""Incrementally maintained rollups behind /payments/balance and /dashboard/analytics
+
+Mutations call the record_* functions inside their own transaction; these
+upsert deltas (INSERT ... ON CONFLICT DO UPDATE), so a delta never depends
+on the rollup row already existing and is never lost. Reads only select
+the row; a user without one has no recorded activity. Rollups for users
+that predate them are filled in by the migration that creates the tables.
+rebuild_rollups recomputes rollups from the source tables (for
+verification or repair) while holding the rows' locks, so concurrent
+deltas either land before it reads the sources or are applied on top of
+the rebuilt values.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import case, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models import Credit, Gig, Submission, User, UserRollup, StoryTypeRollup
+
+ACTIVE_GIG_STATUSES = ("pending", "claimed")
+
+USER_ROLLUP_COLUMNS = (
+    "credits_issued",
+    "credits_expired",
+    "total_spent",
+    "gigs_total",
+    "gigs_active",
+    "gigs_completed",
+    "total_views",
+    "total_likes",
+    "total_outcomes",
+)
+
+def _insert(db: Session):
+    """Dialect insert() supporting ON CONFLICT, or None"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+def _upsert_deltas(db: Session, model, keys: Dict[str, Any], deltas: Dict[str, float]):
+    """Add deltas to a rollup row, creating the row if needed"""
+    insert = _insert(db)
+    if insert is not None:
+        stmt = insert(model).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: getattr(model, column) + stmt.excluded[column] for column in deltas}
+        )
+        db.execute(stmt)
+        return
+    
+    values = {getattr(model, column): getattr(model, column) + delta for column, delta in deltas.items()}
+    updated = db.query(model).filter_by(**keys).update(values, synchronize_session=False)
+    if not updated:
+        db.add(model(**keys, **deltas))
+        db.flush()
+
+def _increment_user(db: Session, user_id: int, deltas: Dict[str, float]):
+    _upsert_deltas(db, UserRollup, {"user_id": user_id}, deltas)
+
+def _increment_story_type(db: Session, business_id: int, story_type: str, deltas: Dict[str, float]):
+    _upsert_deltas(db, StoryTypeRollup, {"business_id": business_id, "story_type": story_type}, deltas)
+
+def _gig_status_deltas(status: Optional[str], sign: int) -> Dict[str, int]:
+    if status in ACTIVE_GIG_STATUSES:
+        return {"gigs_active": sign}
+    if status == "completed":
+        return {"gigs_completed": sign}
+    return {}
+
+def record_credit_issued(db: Session, user_id: int, amount: float):
+    """Account for a newly issued credit"""
+    _increment_user(db, user_id, {"credits_issued": amount})
+
+def record_credits_expired(db: Session, user_id: int, amount: float):
+    """Account for credits marked expired by the sweeper"""
+    _increment_user(db, user_id, {"credits_expired": amount})
+
+def record_gig_posted(db: Session, business_id: int, story_type: str, budget: float, status: str = "pending"):
+    """Account for a newly posted gig"""
+    deltas = {"gigs_total": 1, "total_spent": budget, **_gig_status_deltas(status, 1)}
+    _increment_user(db, business_id, deltas)
+    _increment_story_type(db, business_id, story_type, {"gigs_count": 1, "total_spent": budget})
+
+def record_gig_status_change(db: Session, business_id: int, old_status: Optional[str], new_status: str):
+    """Account for a gig moving between statuses"""
+    if old_status == new_status:
+        return
+    deltas = _gig_status_deltas(old_status, -1)
+    for column, delta in _gig_status_deltas(new_status, 1).items():
+        deltas[column] = deltas.get(column, 0) + delta
+    if deltas:
+        _increment_user(db, business_id, deltas)
+
+def record_metrics_change(db: Session, business_id: int, story_type: str, views: int, likes: int, outcomes: int):
+    """Account for changed submission metrics (deltas) on a business's gig"""
+    if not (views or likes or outcomes):
+        return
+    deltas = {"total_views": views, "total_likes": likes, "total_outcomes": outcomes}
+    _increment_user(db, business_id, deltas)
+    _increment_story_type(db, business_id, story_type, deltas)
+
+def _compute_rollups(db: Session, user_ids: Optional[List[int]] = None) -> Tuple[Dict[int, Dict], Dict[Tuple[int, str], Dict]]:
+    """Aggregate rollup values from the source tables"""
+    users: Dict[int, Dict] = defaultdict(lambda: defaultdict(int))
+    stories: Dict[Tuple[int, str], Dict] = defaultdict(lambda: defaultdict(int))
+    
+    credits_query = db.query(
+        Credit.user_id,
+        func.sum(Credit.amount),
+        func.sum(case((Credit.expired == True, Credit.amount), else_=0.0))
+    ).group_by(Credit.user_id)
+    gigs_query = db.query(
+        Gig.business_id, Gig.story_type, Gig.status, func.count(Gig.id), func.coalesce(func.sum(Gig.budget), 0.0)
+    ).group_by(Gig.business_id, Gig.story_type, Gig.status)
+    submissions_query = db.query(
+        Gig.business_id,
+        Gig.story_type,
+        func.coalesce(func.sum(Submission.views), 0),
+        func.coalesce(func.sum(Submission.likes), 0),
+        func.coalesce(func.sum(Submission.outcomes), 0)
+    ).join(Gig, Submission.gig_id == Gig.id).group_by(Gig.business_id, Gig.story_type)
+    
+    if user_ids is not None:
+        credits_query = credits_query.filter(Credit.user_id.in_(user_ids))
+        gigs_query = gigs_query.filter(Gig.business_id.in_(user_ids))
+        submissions_query = submissions_query.filter(Gig.business_id.in_(user_ids))
+        for user_id in user_ids:
+            users[user_id]
+    
+    for user_id, issued, expired in credits_query:
+        users[user_id]["credits_issued"] += issued or 0.0
+        users[user_id]["credits_expired"] += expired or 0.0
+    
+    for business_id, story_type, status, count, budget in gigs_query:
+        user = users[business_id]
+        user["gigs_total"] += count
+        user["total_spent"] += budget
+        for column, sign in _gig_status_deltas(status, 1).items():
+            user[column] += sign * count
+        story = stories[(business_id, story_type)]
+        story["gigs_count"] += count
+        story["total_spent"] += budget
+    
+    for business_id, story_type, views, likes, outcomes in submissions_query:
+        for row in (users[business_id], stories[(business_id, story_type)]):
+            row["total_views"] += views
+            row["total_likes"] += likes
+            row["total_outcomes"] += outcomes
+    
+    return users, stories
+
+def _ensure_user_rows(db: Session, user_ids: List[int]):
+    """Create missing (zero) user rollup rows so they can be locked"""
+    insert = _insert(db)
+    if insert is not None:
+        for start in range(0, len(user_ids), 1000):
+            db.execute(
+                insert(UserRollup).values([{"user_id": user_id} for user_id in user_ids[start:start + 1000]])
+                .on_conflict_do_nothing(index_elements=["user_id"])
+            )
+        return
+    
+    existing = {user_id for (user_id,) in db.query(UserRollup.user_id).filter(UserRollup.user_id.in_(user_ids))}
+    db.add_all(UserRollup(user_id=user_id) for user_id in user_ids if user_id not in existing)
+
+def rebuild_rollups(db: Session, user_ids: Optional[List[int]] = None) -> int:
+    """Recompute rollups from scratch (for all users, or the given ones); returns users rebuilt
+    
+    The user rows are created and committed first, then locked before the
+    source tables are read. Writers upsert the user row before the story
+    type rows, so a concurrent delta either commits before the lock is
+    taken (and is counted by the recompute) or waits and is applied on
+    top of the rebuilt values.
+    """
+    ids = list(user_ids) if user_ids is not None else [user_id for (user_id,) in db.query(User.id)]
+    if not ids:
+        return 0
+    _ensure_user_rows(db, ids)
+    db.commit()
+    
+    db.query(UserRollup.user_id).filter(UserRollup.user_id.in_(ids)).with_for_update().all()
+    users, stories = _compute_rollups(db, user_ids)
+    
+    db.execute(update(UserRollup), [
+        {"user_id": user_id, **{column: users.get(user_id, {}).get(column, 0) for column in USER_ROLLUP_COLUMNS}}
+        for user_id in ids
+    ])
+    story_rollups = db.query(StoryTypeRollup)
+    if user_ids is not None:
+        story_rollups = story_rollups.filter(StoryTypeRollup.business_id.in_(ids))
+    story_rollups.delete(synchronize_session=False)
+    db.add_all(
+        StoryTypeRollup(business_id=business_id, story_type=story_type, **values)
+        for (business_id, story_type), values in stories.items()
+    )
+    db.commit()
+    return len(ids)
+
+def get_user_rollup(db: Session, user_id: int) -> UserRollup:
+    """Return the user's rollup row (all zeros, not persisted, if the user has no activity yet)"""
+    rollup = db.query(UserRollup).filter(UserRollup.user_id == user_id).first()
+    if rollup is None:
+        rollup = UserRollup(user_id=user_id, **{column: 0 for column in USER_ROLLUP_COLUMNS})
+    return rollup
+
+def get_story_type_rollups(db: Session, business_id: int) -> List[StoryTypeRollup]:
+    """Per story type rollups for a business"""
+    return db.query(StoryTypeRollup).filter(StoryTypeRollup.business_id == business_id).all()
@@ -0,0 +1,141 @@
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, List, Any
+from ..config import get_settings
+
+settings = get_settings()
+
+_s3_client = None
+_s3_lock = threading.Lock()
+
+def get_s3_client():
+    """Shared per-process S3 client; boto3 is imported and the client built on first use"""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.aws_access_key_id,
+                    aws_secret_access_key=settings.aws_secret_access_key,
+                    region_name=settings.aws_region
+                )
+    return _s3_client
+
+class S3Storage:
+    """Object storage on AWS S3 using multipart uploads"""
+    
+    def __init__(self, bucket: str, region: str):
+        self.bucket = bucket
+        self.region = region
+    
+    def url_for(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+    
+    def key_for(self, url: str) -> str:
+        return url.split(f"{self.bucket}.s3.{self.region}.amazonaws.com/")[1]
+    
+    def start_upload(self, key: str, content_type: str, metadata: Dict[str, str]) -> str:
+        response = get_s3_client().create_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            ContentType=content_type,
+            Metadata=metadata
+        )
+        return response['UploadId']
+    
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> Dict[str, Any]:
+        response = get_s3_client().upload_part(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+    
+    def complete_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]):
+        get_s3_client().complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    
+    def abort_upload(self, key: str, upload_id: str):
+        get_s3_client().abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+    
+    def put(self, key: str, data: bytes, content_type: str):
+        get_s3_client().put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+    
+    def download(self, key: str, path: str):
+        get_s3_client().download_file(self.bucket, key, path)
+    
+    def delete(self, key: str):
+        get_s3_client().delete_object(Bucket=self.bucket, Key=key)
+
+class LocalStorage:
+    """Object storage on the local filesystem (development and tests)
+    
+    Parts are staged in a uniquely named directory per upload and
+    concatenated into a temporary file that is moved into place, so
+    concurrent uploads of the same key don't collide.
+    """
+    
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+    
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+    
+    def key_for(self, url: str) -> str:
+        return url[len(self.base_url) + 1:]
+    
+    def start_upload(self, key: str, content_type: str, metadata: Dict[str, str]) -> str:
+        upload_id = f"{self._path(key)}.{uuid.uuid4().hex}.parts"
+        os.makedirs(upload_id)
+        return upload_id
+    
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> Dict[str, Any]:
+        with open(os.path.join(upload_id, str(part_number)), "wb") as part:
+            part.write(data)
+        return {'PartNumber': part_number}
+    
+    def complete_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]]):
+        assembled = os.path.join(upload_id, "assembled")
+        with open(assembled, "wb") as target:
+            for part in sorted(parts, key=lambda p: p['PartNumber']):
+                with open(os.path.join(upload_id, str(part['PartNumber'])), "rb") as source:
+                    shutil.copyfileobj(source, target)
+        os.replace(assembled, self._path(key))
+        shutil.rmtree(upload_id, ignore_errors=True)
+    
+    def abort_upload(self, key: str, upload_id: str):
+        shutil.rmtree(upload_id, ignore_errors=True)
+    
+    def put(self, key: str, data: bytes, content_type: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            target.write(data)
+    
+    def download(self, key: str, path: str):
+        shutil.copyfile(self._path(key), path)
+    
+    def delete(self, key: str):
+        os.remove(self._path(key))
+
+def build_storage(backend: str):
+    """Build the storage backend selected in settings"""
+    if backend == "local":
+        return LocalStorage(settings.local_storage_dir, settings.local_storage_url)
+    return S3Storage(settings.s3_bucket_name, settings.aws_region)
+
+storage = build_storage(settings.storage_backend)
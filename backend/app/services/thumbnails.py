@@ -0,0 +1,156 @@
+import asyncio
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from ..cache import TTLCache
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import StoredFile
+from .storage import storage
+
+if TYPE_CHECKING:
+    from PIL import Image  # imported in the worker processes that render
+
+settings = get_settings()
+
+# Resized variants produced for every video
+THUMBNAIL_SIZES = {
+    "small": (320, 180),
+    "medium": (640, 360),
+}
+
+# Thumbnail URLs by content hash, so repeat renders skip the database;
+# placeholders are only cached briefly and never stored
+_thumbnail_cache = TTLCache(maxsize=settings.thumbnail_cache_size, ttl=settings.thumbnail_cache_ttl)
+_inflight: Dict[str, asyncio.Future] = {}
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.thumbnail_workers)
+    return _executor
+
+def _extract_frame(source_path: str) -> Optional["Image.Image"]:
+    """Decode a representative frame; None if the video can't be decoded"""
+    from PIL import Image
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-ss", "1", "-i", source_path,
+             "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-"],
+            capture_output=True,
+            timeout=30
+        )
+        if result.returncode == 0 and result.stdout:
+            return Image.open(io.BytesIO(result.stdout)).convert("RGB")
+    
+    # Without ffmpeg, PIL can still decode image-based containers (GIF, WebP, ...)
+    try:
+        with Image.open(source_path) as image:
+            return image.convert("RGB")
+    except Exception:
+        return None
+
+def render_thumbnails(source_path: str, content_hash: str) -> Tuple[Dict[str, bytes], bool]:
+    """Render JPEG thumbnail variants for a video (runs in a worker process)
+    
+    Returns the variants and whether they are placeholders: a solid colour
+    derived from the content hash, used when no frame could be decoded.
+    """
+    from PIL import Image, ImageOps
+    frame = _extract_frame(source_path)
+    placeholder = frame is None
+    if placeholder:
+        frame = Image.new("RGB", THUMBNAIL_SIZES["medium"], tuple(bytes.fromhex(content_hash[:6])))
+    variants = {}
+    for name, size in THUMBNAIL_SIZES.items():
+        output = io.BytesIO()
+        ImageOps.fit(frame, size).save(output, format="JPEG", quality=80)
+        variants[name] = output.getvalue()
+    return variants, placeholder
+
+def _load_stored_file(video_url: str) -> Optional[Dict[str, object]]:
+    db = SessionLocal()
+    try:
+        stored_file = db.query(StoredFile).filter(StoredFile.url == video_url).first()
+        if not stored_file:
+            return None
+        return {
+            "content_hash": stored_file.content_hash,
+            "key": stored_file.key,
+            "thumbnail_urls": stored_file.thumbnail_urls
+        }
+    finally:
+        db.close()
+
+def _save_thumbnail_urls(content_hash: str, thumbnail_urls: Dict[str, str]):
+    db = SessionLocal()
+    try:
+        db.query(StoredFile).filter(
+            StoredFile.content_hash == content_hash
+        ).update({StoredFile.thumbnail_urls: thumbnail_urls}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+async def _build_thumbnails(content_hash: str, key: str) -> Tuple[Dict[str, str], bool]:
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, os.path.basename(key))
+        await run_in_threadpool(storage.download, key, source_path)
+        variants, placeholder = await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), render_thumbnails, source_path, content_hash
+        )
+    
+    thumbnail_urls = {}
+    suffix = "_placeholder" if placeholder else ""
+    for name, data in variants.items():
+        thumbnail_key = f"thumbnails/{content_hash}_{name}{suffix}.jpg"
+        await run_in_threadpool(storage.put, thumbnail_key, data, "image/jpeg")
+        thumbnail_urls[name] = storage.url_for(thumbnail_key)
+    
+    # Placeholders are not recorded, so the video is rendered again once a
+    # worker that can decode it (ffmpeg installed) picks it up
+    if not placeholder:
+        await run_in_threadpool(_save_thumbnail_urls, content_hash, thumbnail_urls)
+    return thumbnail_urls, placeholder
+
+async def get_thumbnails(video_url: str) -> Optional[Dict[str, str]]:
+    """Return thumbnail URLs for an uploaded video, generating them once per content hash"""
+    stored_file = await run_in_threadpool(_load_stored_file, video_url)
+    if not stored_file:
+        return None
+    
+    content_hash = stored_file["content_hash"]
+    cached = _thumbnail_cache.get(content_hash)
+    if cached is not None:
+        return cached
+    if stored_file["thumbnail_urls"]:
+        _thumbnail_cache.set(content_hash, stored_file["thumbnail_urls"])
+        return stored_file["thumbnail_urls"]
+    
+    # Concurrent requests for the same video share one render
+    if content_hash in _inflight:
+        return await asyncio.shield(_inflight[content_hash])
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[content_hash] = future
+    try:
+        thumbnail_urls, placeholder = await _build_thumbnails(content_hash, stored_file["key"])
+        _thumbnail_cache.set(
+            content_hash,
+            thumbnail_urls,
+            ttl=settings.thumbnail_placeholder_ttl if placeholder else None
+        )
+        future.set_result(thumbnail_urls)
+        return thumbnail_urls
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        del _inflight[content_hash]
@@ -0,0 +1,381 @@
+"""Asynchronous, idempotent Stripe webhook processing
+
+The webhook endpoint verifies the Stripe signature, then only stores the
+raw event (deduplicated on the Stripe event id) and queues it. A pool of
+workers processes stored events; every event for the same Stripe object is
+routed to the same worker. Before running a handler, a worker claims the
+event with one conditional UPDATE (pending -> processing) that also
+requires no earlier event for the same object to be pending or
+processing, so each event is handled once and in order even when several
+processes share the table. Events that could not be queued or claimed stay
+pending and are picked up by a periodic re-poll, which also retries events
+stuck in processing. Failed events can be replayed with
+`python -m app.manage replay-webhooks`.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from ..models import Payout, WebhookEvent
+from ..database import SessionLocal
+from ..config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Statuses that hold back later events for the same object
+IN_FLIGHT_STATUSES = ("pending", "processing")
+
+class InvalidWebhookSignature(Exception):
+    """The request is not a correctly signed Stripe event"""
+
+def verify_webhook_signature(body: bytes, signature: Optional[str], secret: Optional[str] = None) -> Dict[str, Any]:
+    """Check the Stripe-Signature header against the raw body; returns the event payload"""
+    import stripe
+    if not signature:
+        raise InvalidWebhookSignature("Missing Stripe-Signature header")
+    try:
+        # The verification half of stripe.Webhook.construct_event; the stored
+        # payload stays the plain JSON rather than a StripeObject
+        stripe.WebhookSignature.verify_header(
+            body.decode("utf-8"), signature, secret or settings.stripe_webhook_secret, stripe.Webhook.DEFAULT_TOLERANCE
+        )
+        return json.loads(body)
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        raise InvalidWebhookSignature(str(e)) from e
+
+def sign_payload(body: bytes, secret: Optional[str] = None, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header for a payload (for local testing)"""
+    timestamp = timestamp or int(time.time())
+    digest = hmac.new(
+        (secret or settings.stripe_webhook_secret).encode(),
+        f"{timestamp}.".encode() + body,
+        hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def handle_payment_success(db: Session, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle successful payment"""
+    return {"status": "payment_processed"}
+
+def handle_payment_failure(db: Session, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle failed payment"""
+    return {"status": "payment_failed"}
+
+def handle_payout_success(db: Session, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle successful payout: settle the matching ledger row"""
+    payout_id = data.get("object", {}).get("id")
+    updated = db.query(Payout).filter(
+        Payout.provider_payout_id == payout_id
+    ).update({Payout.status: "paid", Payout.error: None}, synchronize_session=False) if payout_id else 0
+    return {"status": "payout_completed", "ledger_updated": updated}
+
+def handle_payout_failure(db: Session, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle failed payout: mark the ledger row for the next payout run"""
+    payout = data.get("object", {})
+    updated = db.query(Payout).filter(
+        Payout.provider_payout_id == payout.get("id")
+    ).update(
+        {Payout.status: "failed", Payout.error: payout.get("failure_message") or "Payout failed"},
+        synchronize_session=False
+    ) if payout.get("id") else 0
+    return {"status": "payout_failed", "ledger_updated": updated}
+
+WEBHOOK_HANDLERS: Dict[str, Callable[[Session, Dict[str, Any]], Dict[str, Any]]] = {
+    "payment_intent.succeeded": handle_payment_success,
+    "payment_intent.payment_failed": handle_payment_failure,
+    "payout.paid": handle_payout_success,
+    "payout.failed": handle_payout_failure,
+}
+
+def _event_identity(payload: Dict[str, Any]) -> Tuple[str, str]:
+    """Return (event_id, object_id) for a raw event"""
+    event_id = payload.get("id")
+    if not event_id:
+        # Not a Stripe event id; deduplicate on content instead
+        event_id = "sha256:" + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    data_object = payload.get("data", {}).get("object")
+    object_id = data_object.get("id") if isinstance(data_object, dict) else None
+    return event_id, object_id or event_id
+
+def store_webhook_event(db: Session, payload: Dict[str, Any]) -> Tuple[Optional[int], str, str]:
+    """Persist a raw event; returns (row id or None if a duplicate, event_id, object_id)"""
+    event_id, object_id = _event_identity(payload)
+    values = {
+        "event_id": event_id,
+        "type": payload.get("type", "unknown"),
+        "object_id": object_id,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0
+    }
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        row = db.execute(
+            insert(WebhookEvent).values(**values).on_conflict_do_nothing(
+                index_elements=["event_id"]
+            ).returning(WebhookEvent.id)
+        ).first()
+        db.commit()
+        return (row.id if row else None), event_id, object_id
+
+    event = WebhookEvent(**values)
+    db.add(event)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None, event_id, object_id
+    return event.id, event_id, object_id
+
+def process_event(db: Session, event: WebhookEvent) -> str:
+    """Run the handler for one stored event and record the outcome; returns the new status"""
+    handler = WEBHOOK_HANDLERS.get(event.type)
+    try:
+        if handler:
+            result = handler(db, event.payload.get("data", {}))
+        else:
+            result = {"status": "event_ignored", "type": event.type}
+        event.status = "processed"
+        event.result = result
+        event.error = None
+    except Exception as e:
+        db.rollback()
+        logger.exception("Webhook event %s failed", event.event_id)
+        event.status = "failed"
+        event.error = str(e)
+    event.attempts = (event.attempts or 0) + 1
+    event.processed_at = datetime.utcnow()
+    db.commit()
+    return event.status
+
+def claim_event(db: Session, event_pk: int, statuses: Sequence[str] = ("pending",)) -> Optional[WebhookEvent]:
+    """Atomically move an event to processing; None if it is taken, done or must wait for an earlier event"""
+    earlier = aliased(WebhookEvent)
+    blocked = select(earlier.id).where(
+        earlier.object_id == WebhookEvent.object_id,
+        earlier.id < WebhookEvent.id,
+        earlier.status.in_(IN_FLIGHT_STATUSES)
+    ).exists()
+    claimed = db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == event_pk, WebhookEvent.status.in_(statuses), ~blocked)
+        .values(status="processing", claimed_at=datetime.utcnow())
+        .returning(WebhookEvent.id)
+    ).first()
+    db.commit()
+    return db.get(WebhookEvent, event_pk) if claimed else None
+
+def process_stored_event(event_pk: int) -> str:
+    """Claim and process a stored event by primary key in its own session"""
+    db = SessionLocal()
+    try:
+        event = claim_event(db, event_pk)
+        if event is None:
+            return "skipped"
+        return process_event(db, event)
+    finally:
+        db.close()
+
+def replay_events(
+    db: Session,
+    event_ids: Optional[Sequence[str]] = None,
+    statuses: Sequence[str] = ("pending", "failed"),
+    limit: Optional[int] = None
+) -> Dict[str, int]:
+    """Re-run stored events in arrival order (by event id, or all with the given statuses)"""
+    query = db.query(WebhookEvent.id)
+    if event_ids:
+        query = query.filter(WebhookEvent.event_id.in_(event_ids))
+        statuses = ("pending", "processed", "failed")
+    else:
+        query = query.filter(WebhookEvent.status.in_(statuses))
+    query = query.order_by(WebhookEvent.id)
+    if limit:
+        query = query.limit(limit)
+
+    counts = {"processed": 0, "failed": 0, "skipped": 0}
+    for (event_pk,) in query.all():
+        # Claimed like any worker would, so a running API never handles it concurrently
+        event = claim_event(db, event_pk, statuses)
+        counts[process_event(db, event) if event else "skipped"] += 1
+    return counts
+
+def release_stale_events(db: Session, timeout: float) -> int:
+    """Return events stuck in processing (e.g. after a crash) to pending; returns the count"""
+    released = db.query(WebhookEvent).filter(
+        WebhookEvent.status == "processing",
+        WebhookEvent.claimed_at < datetime.utcnow() - timedelta(seconds=timeout)
+    ).update({WebhookEvent.status: "pending"}, synchronize_session=False)
+    db.commit()
+    return released
+
+def fake_event(event_type: str = "payout.paid", object_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build a Stripe-shaped event for local testing"""
+    object_type = event_type.split(".")[0]
+    prefix = {"payout": "po", "payment_intent": "pi"}.get(object_type, "obj")
+    return {
+        "id": f"evt_fake_{uuid.uuid4().hex[:24]}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "livemode": False,
+        "data": {
+            "object": {
+                "id": object_id or f"{prefix}_fake_{uuid.uuid4().hex[:16]}",
+                "object": object_type,
+                "amount": random.randint(1000, 20000),
+                "currency": "usd",
+                "status": event_type.split(".")[-1]
+            }
+        }
+    }
+
+class WebhookDispatcher:
+    """Worker pool processing stored events, sharded by Stripe object id"""
+
+    def __init__(self, workers: int = 4, queue_size: int = 10000, poll_interval: float = 30, processing_timeout: float = 300):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.processing_timeout = processing_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._queued: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._poll_task: Optional[asyncio.Task] = None
+        self._counters = {
+            "received": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "dropped": 0,
+            "requeued": 0,
+            "released": 0
+        }
+
+    def start(self):
+        """Start the worker pool (and the re-poll loop) on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._queued = set()
+        self._tasks = [loop.create_task(self._worker(queue)) for queue in self._queues]
+        if self.poll_interval > 0:
+            self._poll_task = loop.create_task(self._poll())
+
+    async def stop(self, timeout: float = 10.0):
+        """Finish queued events (up to timeout) and stop the workers"""
+        if not self._tasks:
+            return
+        if self._poll_task:
+            self._poll_task.cancel()
+            await asyncio.gather(self._poll_task, return_exceptions=True)
+            self._poll_task = None
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            # Unfinished events stay pending in the database
+            logger.warning("Webhook queue not drained on shutdown: %d pending", self.queue_depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def recover(self):
+        """Queue events left pending by a previous process"""
+        self.start()
+        await self.requeue_pending()
+
+    async def requeue_pending(self) -> int:
+        """Release stale claims and queue pending events not already queued; returns events queued"""
+        released, pending = await asyncio.to_thread(_pending_events, self.processing_timeout)
+        self._counters["released"] += released
+        requeued = sum(
+            1 for event_pk, object_id in pending
+            if event_pk not in self._queued and self.enqueue(event_pk, object_id, count=False)
+        )
+        self._counters["requeued"] += requeued
+        if requeued:
+            logger.info("Requeued %d pending webhook events", requeued)
+        return requeued
+
+    def record_duplicate(self):
+        self._counters["duplicates"] += 1
+
+    def enqueue(self, event_pk: int, object_id: str, count: bool = True) -> bool:
+        """Queue a stored event; returns False if its worker's queue is full (the re-poll retries it)"""
+        self.start()
+        queue = self._queues[zlib.crc32(object_id.encode()) % len(self._queues)]
+        try:
+            queue.put_nowait(event_pk)
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            logger.warning("Webhook queue full, event %s left pending for the re-poll", event_pk)
+            return False
+        self._queued.add(event_pk)
+        if count:
+            self._counters["received"] += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self) -> Dict[str, int]:
+        """Processing counters and current queue depth"""
+        return {**self._counters, "queue_depth": self.queue_depth()}
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            event_pk = await queue.get()
+            try:
+                outcome = await asyncio.to_thread(process_stored_event, event_pk)
+                if outcome in self._counters:
+                    self._counters[outcome] += 1
+            except Exception:
+                logger.exception("Webhook worker failed on event %s", event_pk)
+            finally:
+                self._queued.discard(event_pk)
+                queue.task_done()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.requeue_pending()
+            except Exception:
+                logger.exception("Webhook re-poll failed")
+
+def _pending_events(processing_timeout: float) -> Tuple[int, List[Tuple[int, str]]]:
+    db = SessionLocal()
+    try:
+        released = release_stale_events(db, processing_timeout)
+        pending = db.query(WebhookEvent.id, WebhookEvent.object_id).filter(
+            WebhookEvent.status == "pending"
+        ).order_by(WebhookEvent.id).all()
+        return released, pending
+    finally:
+        db.close()
+
+webhook_dispatcher = WebhookDispatcher(
+    workers=settings.webhook_workers,
+    queue_size=settings.webhook_queue_size,
+    poll_interval=settings.webhook_poll_interval,
+    processing_timeout=settings.webhook_processing_timeout
+)
@@ -0,0 +1,37 @@
+"""Alembic environment: runs migrations against the app's configured database"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.config import get_settings
+from app.database import Base, engine
+from app import models  # noqa: F401  registers the tables on Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        render_as_batch=True,  # SQLite can only alter tables by copying them
+        **kwargs
+    )
+
+def run_migrations_offline():
+    _configure(url=get_settings().database_url, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
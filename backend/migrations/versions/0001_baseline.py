@@ -0,0 +1,102 @@
+"""Baseline schema (tables as created by Base.metadata.create_all in main.py before migrations existed)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "gigs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("business_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("budget", sa.Float(), nullable=False),
+        sa.Column("goals", sa.String(), nullable=False),
+        sa.Column("story_type", sa.String(), nullable=False),
+        sa.Column("raw_footage_url", sa.String()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_gigs_id", "gigs", ["id"])
+
+    op.create_table(
+        "submissions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("gig_id", sa.Integer(), sa.ForeignKey("gigs.id"), nullable=False),
+        sa.Column("clipper_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("edited_video_url", sa.String()),
+        sa.Column("social_post_link", sa.String()),
+        sa.Column("views", sa.Integer()),
+        sa.Column("likes", sa.Integer()),
+        sa.Column("outcomes", sa.Integer()),
+        sa.Column("bonus", sa.Float()),
+        sa.Column("approved", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_submissions_id", "submissions", ["id"])
+
+    op.create_table(
+        "lessons",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("content", sa.Text()),
+        sa.Column("quiz", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_lessons_id", "lessons", ["id"])
+
+    op.create_table(
+        "certifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("clipper_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("level", sa.String(), nullable=False),
+        sa.Column("completed", sa.Boolean()),
+        sa.Column("completed_at", sa.DateTime()),
+    )
+    op.create_index("ix_certifications_id", "certifications", ["id"])
+
+    op.create_table(
+        "credits",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("expiry", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_credits_id", "credits", ["id"])
+
+    op.create_table(
+        "self_promos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("business_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("post_link", sa.String(), nullable=False),
+        sa.Column("views", sa.Integer()),
+        sa.Column("likes", sa.Integer()),
+        sa.Column("credit_earned", sa.Float()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_self_promos_id", "self_promos", ["id"])
+
+def downgrade():
+    for table in ("self_promos", "credits", "certifications", "lessons", "submissions", "gigs", "users"):
+        op.drop_table(table)
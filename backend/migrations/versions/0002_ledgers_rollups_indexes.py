@@ -0,0 +1,171 @@
+"""Payout and webhook ledgers, stored files, rollups, credit expiry flag and indexes
+
+Rollups are backfilled from the existing gigs, submissions and credits.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Gigs: keyset pagination of the marketplace
+    op.create_index("ix_gigs_status_created_at_id", "gigs", ["status", "created_at", "id"])
+
+    # Submissions: one claim per clipper and gig, clipper earnings aggregate
+    duplicates = bind.execute(sa.text(
+        "SELECT COUNT(*) FROM (SELECT gig_id, clipper_id FROM submissions "
+        "GROUP BY gig_id, clipper_id HAVING COUNT(*) > 1) AS duplicates"
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (gig_id, clipper_id) pairs have more than one submission; "
+            "merge them before adding uq_submissions_gig_clipper"
+        )
+    with op.batch_alter_table("submissions") as batch:
+        batch.create_unique_constraint("uq_submissions_gig_clipper", ["gig_id", "clipper_id"])
+    op.create_index("ix_submissions_clipper_id_approved", "submissions", ["clipper_id", "approved"])
+
+    # Credits: expiry flag set by the sweeper (existing rows start unexpired)
+    op.add_column("credits", sa.Column("expired", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index("ix_credits_user_id_expired", "credits", ["user_id", "expired"])
+    op.create_index("ix_credits_expired_expiry", "credits", ["expired", "expiry"])
+    op.create_index("ix_credits_user_id_source_created_at", "credits", ["user_id", "source", "created_at"])
+
+    op.create_table(
+        "payouts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("submission_id", sa.Integer(), sa.ForeignKey("submissions.id"), nullable=False, unique=True),
+        sa.Column("business_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("clipper_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("base_pay", sa.Float(), nullable=False),
+        sa.Column("bonus", sa.Float(), nullable=False),
+        sa.Column("platform_fee", sa.Float(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("idempotency_key", sa.String(), nullable=False, unique=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("provider_payout_id", sa.String()),
+        sa.Column("error", sa.Text()),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_payouts_id", "payouts", ["id"])
+    op.create_index("ix_payouts_business_id", "payouts", ["business_id"])
+    op.create_index("ix_payouts_clipper_id", "payouts", ["clipper_id"])
+    op.create_index("ix_payouts_provider_payout_id", "payouts", ["provider_payout_id"])
+
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_id", sa.String(), nullable=False, unique=True),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("object_id", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("result", sa.JSON()),
+        sa.Column("error", sa.Text()),
+        sa.Column("received_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("claimed_at", sa.DateTime()),
+        sa.Column("processed_at", sa.DateTime()),
+    )
+    op.create_index("ix_webhook_events_id", "webhook_events", ["id"])
+    op.create_index("ix_webhook_events_status_id", "webhook_events", ["status", "id"])
+    op.create_index("ix_webhook_events_object_id_id", "webhook_events", ["object_id", "id"])
+
+    op.create_table(
+        "stored_files",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("folder", sa.String(), nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("thumbnail_urls", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint("folder", "content_hash", name="uq_stored_files_folder_content_hash"),
+    )
+    op.create_index("ix_stored_files_id", "stored_files", ["id"])
+    op.create_index("ix_stored_files_content_hash", "stored_files", ["content_hash"])
+    op.create_index("ix_stored_files_url", "stored_files", ["url"])
+
+    op.create_table(
+        "user_rollups",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("credits_issued", sa.Float(), nullable=False),
+        sa.Column("credits_expired", sa.Float(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("gigs_total", sa.Integer(), nullable=False),
+        sa.Column("gigs_active", sa.Integer(), nullable=False),
+        sa.Column("gigs_completed", sa.Integer(), nullable=False),
+        sa.Column("total_views", sa.Integer(), nullable=False),
+        sa.Column("total_likes", sa.Integer(), nullable=False),
+        sa.Column("total_outcomes", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        "story_type_rollups",
+        sa.Column("business_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("story_type", sa.String(), primary_key=True),
+        sa.Column("gigs_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("total_views", sa.Integer(), nullable=False),
+        sa.Column("total_likes", sa.Integer(), nullable=False),
+        sa.Column("total_outcomes", sa.Integer(), nullable=False),
+    )
+
+    _backfill_rollups()
+
+def _backfill_rollups():
+    """Compute rollups from the source tables (the writers keep them current from here on)"""
+    op.execute("""
+        INSERT INTO story_type_rollups (business_id, story_type, gigs_count, total_spent, total_views, total_likes, total_outcomes)
+        SELECT g.business_id, g.story_type, COUNT(*), COALESCE(SUM(g.budget), 0),
+               COALESCE(SUM(m.views), 0), COALESCE(SUM(m.likes), 0), COALESCE(SUM(m.outcomes), 0)
+        FROM gigs g
+        LEFT JOIN (
+            SELECT gig_id, SUM(views) AS views, SUM(likes) AS likes, SUM(outcomes) AS outcomes
+            FROM submissions GROUP BY gig_id
+        ) m ON m.gig_id = g.id
+        GROUP BY g.business_id, g.story_type
+    """)
+    # Credits from before the expiry flag start unexpired; the sweeper adds
+    # them to credits_expired as it flips them
+    op.execute("""
+        INSERT INTO user_rollups (user_id, credits_issued, credits_expired, total_spent, gigs_total,
+                                  gigs_active, gigs_completed, total_views, total_likes, total_outcomes)
+        SELECT u.id,
+               COALESCE((SELECT SUM(c.amount) FROM credits c WHERE c.user_id = u.id), 0),
+               COALESCE((SELECT SUM(c.amount) FROM credits c WHERE c.user_id = u.id AND c.expired), 0),
+               COALESCE((SELECT SUM(g.budget) FROM gigs g WHERE g.business_id = u.id), 0),
+               (SELECT COUNT(*) FROM gigs g WHERE g.business_id = u.id),
+               (SELECT COUNT(*) FROM gigs g WHERE g.business_id = u.id AND g.status IN ('pending', 'claimed')),
+               (SELECT COUNT(*) FROM gigs g WHERE g.business_id = u.id AND g.status = 'completed'),
+               COALESCE((SELECT SUM(s.views) FROM submissions s JOIN gigs g ON s.gig_id = g.id WHERE g.business_id = u.id), 0),
+               COALESCE((SELECT SUM(s.likes) FROM submissions s JOIN gigs g ON s.gig_id = g.id WHERE g.business_id = u.id), 0),
+               COALESCE((SELECT SUM(s.outcomes) FROM submissions s JOIN gigs g ON s.gig_id = g.id WHERE g.business_id = u.id), 0)
+        FROM users u
+    """)
+
+def downgrade():
+    for table in ("story_type_rollups", "user_rollups", "stored_files", "webhook_events", "payouts"):
+        op.drop_table(table)
+    for index in ("ix_credits_user_id_source_created_at", "ix_credits_expired_expiry", "ix_credits_user_id_expired"):
+        op.drop_index(index, table_name="credits")
+    with op.batch_alter_table("credits") as batch:
+        batch.drop_column("expired")
+    op.drop_index("ix_submissions_clipper_id_approved", table_name="submissions")
+    with op.batch_alter_table("submissions") as batch:
+        batch.drop_constraint("uq_submissions_gig_clipper", type_="unique")
+    op.drop_index("ix_gigs_status_created_at_id", table_name="gigs")
@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database and in-process backends
+# before app modules read their settings
+_tmpdir = tempfile.mkdtemp(prefix="mx70-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/test.db"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(_tmpdir, "uploads")
+os.environ["EMAIL_BACKEND"] = "local"
+os.environ["RATE_LIMIT_REDIS"] = "false"
+os.environ["CREDIT_EXPIRY_SWEEP_INTERVAL"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+
+from app.database import Base, SessionLocal, engine
+from app import models  # noqa: F401  registers the tables on Base.metadata
+from app.models import Gig, Submission, User
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema"""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Start every test with full rate limit buckets"""
+    from app.middleware import limiter
+
+    limiter._buckets.clear()
+    yield
+    limiter._buckets.clear()
+
+@pytest.fixture
+def business(db):
+    user = User(email="shop@example.com", hashed_password="x", role="business_local")
+    db.add(user)
+    db.commit()
+    return user
+
+@pytest.fixture
+def clipper(db):
+    user = User(email="clipper@example.com", hashed_password="x", role="clipper")
+    db.add(user)
+    db.commit()
+    return user
+
+@pytest.fixture
+def login_as():
+    """Authenticate API requests as the given user"""
+    from app.auth import get_current_active_user
+    from app.main import app
+
+    def login(user):
+        app.dependency_overrides[get_current_active_user] = lambda: user
+    yield login
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def count_queries():
+    """Count statements sent to the database inside a with block"""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counter
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import database
+from app.main import app
+from app.models import Gig, Submission
+from app.routers.gigs import claim_gig_for_clipper
+
+@pytest.fixture
+def async_db(db, monkeypatch):
+    """Serve get_request_db from an asyncio engine, as with DB_ASYNC=true"""
+    async_engine = database.build_async_engine(database.DATABASE_URL)
+    monkeypatch.setattr(database.settings, "db_async", True)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(async_engine, expire_on_commit=False))
+    app.dependency_overrides[database.get_request_db] = database.get_async_db
+    yield async_engine
+    app.dependency_overrides.pop(database.get_request_db, None)
+    asyncio.run(async_engine.dispose())
+
+@pytest.fixture
+def gig(db, business):
+    gig = Gig(business_id=business.id, budget=50.0, goals="1k views", story_type="demo")
+    db.add(gig)
+    db.commit()
+    return gig
+
+def test_claim_runs_on_an_async_session(db, async_db, clipper, gig, login_as):
+    login_as(clipper)
+
+    response = TestClient(app).post(f"/gigs/{gig.id}/claim")
+
+    assert response.status_code == 200
+    assert db.get(Submission, response.json()["submission_id"]).clipper_id == clipper.id
+    db.refresh(gig)
+    assert gig.status == "claimed"
+    assert database.get_pool_stats()["async"]["checkouts"] > 0
+
+def test_run_db_drives_sync_functions_through_an_async_session(db, async_db, clipper, gig):
+    async def claim_twice():
+        async with database.AsyncSessionLocal() as session:
+            assert isinstance(session, AsyncSession)
+            await database.run_db(session, claim_gig_for_clipper, gig.id, clipper.id)
+            with pytest.raises(HTTPException) as excinfo:
+                await database.run_db(session, claim_gig_for_clipper, gig.id, clipper.id)
+            return excinfo.value
+
+    error = asyncio.run(claim_twice())
+
+    assert (error.status_code, error.detail) == (400, "Gig is not available for claiming")
+    assert db.query(Submission).filter_by(gig_id=gig.id).count() == 1
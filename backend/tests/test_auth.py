@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from jose import JWTError
+
+from app import auth
+from app import cache as cache_module
+from app.cache import TTLCache
+from app.main import app
+
+client = TestClient(app)
+
+def test_signup_then_login(db):
+    response = client.post("/signup", json={"email": "new@example.com", "password": "hunter22", "role": "clipper"})
+    assert response.status_code == 200
+
+    response = client.post("/token", data={"username": "new@example.com", "password": "hunter22"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = client.post("/token", data={"username": "new@example.com", "password": "wrong"})
+    assert response.status_code == 401
+
+def test_password_work_beyond_the_queue_limit_is_shed(monkeypatch):
+    monkeypatch.setitem(auth._password_counters, "in_flight", auth.settings.password_hash_workers + auth.settings.password_hash_queue_limit)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.get_password_hash("hunter22"))
+
+    assert error.value.status_code == 503
+
+def test_password_hashing_releases_its_slot():
+    hashed = asyncio.run(auth.get_password_hash("hunter22"))
+
+    assert asyncio.run(auth.verify_password("hunter22", hashed))
+    assert auth.get_password_pool_stats()["in_flight"] == 0
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    cache = TTLCache(maxsize=100, ttl=3600)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    return cache
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Tokens passed to the real JWT verification"""
+    tokens = []
+    real_decode = auth.jwt.decode
+
+    def counting_decode(token, *args, **kwargs):
+        tokens.append(token)
+        return real_decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return tokens
+
+def test_cached_tokens_skip_verification(token_cache, decodes):
+    token = auth.create_access_token({"sub": "shop@example.com"}, timedelta(minutes=5))
+
+    first = auth.decode_access_token(token)
+    second = auth.decode_access_token(token)
+
+    assert first == second
+    assert first["sub"] == "shop@example.com"
+    assert decodes == [token]
+    assert (token_cache.stats()["hits"], token_cache.stats()["misses"]) == (1, 1)
+
+def test_cached_payload_lives_until_the_token_expires(token_cache, decodes, monkeypatch):
+    token = auth.create_access_token({"sub": "shop@example.com"}, timedelta(minutes=5))
+    exp = auth.jwt.get_unverified_claims(token)["exp"]
+    now = exp - 120.0
+    monkeypatch.setattr(auth, "time", SimpleNamespace(time=lambda: now))
+    started = time.monotonic()
+
+    auth.decode_access_token(token)
+
+    expires_at = token_cache._data[hashlib.sha256(token.encode()).hexdigest()][0]
+    assert expires_at - started == pytest.approx(exp - now, abs=1.0)
+
+    # Once the pretend clock passes exp the payload is no longer served from the cache
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: started + 121.0))
+    assert token_cache.get(hashlib.sha256(token.encode()).hexdigest()) is None
+    auth.decode_access_token(token)
+    assert decodes == [token, token]
+
+def test_expired_tokens_are_rejected_and_not_cached(token_cache, decodes):
+    token = auth.create_access_token({"sub": "shop@example.com"}, timedelta(minutes=-1))
+
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            auth.decode_access_token(token)
+
+    assert decodes == [token, token]
+    assert token_cache.stats()["size"] == 0
+    assert (token_cache.stats()["hits"], token_cache.stats()["misses"]) == (0, 2)
+
+def test_expired_token_gets_401(db):
+    token = auth.create_access_token({"sub": "shop@example.com"}, timedelta(minutes=-1))
+
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
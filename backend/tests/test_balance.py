@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app.main import app
+from app.models import Credit, Gig, Payout
+from app.services.credit_expiry import expire_credits
+from app.services.credits import issue_credit
+
+client = TestClient(app)
+
+def _balance(login_as, user):
+    login_as(user)
+    response = client.get("/payments/balance")
+    assert response.status_code == 200
+    return response.json()
+
+def test_balance_matches_the_ledgers(db, business, clipper, login_as):
+    # Issue: two gigs earn posting credits, plus an old credit that is past its expiry
+    login_as(business)
+    gig_ids = [
+        client.post("/gigs/post-gig", json={"budget": budget, "goals": "1k views", "story_type": "demo"}).json()["id"]
+        for budget in (100.0, 60.0)
+    ]
+    stale = issue_credit(db, business.id, 10.0, "self-promo")
+    stale.expiry = datetime.utcnow() - timedelta(days=1)
+    db.commit()
+
+    # Pay out: the clipper delivers the first gig and the business pays for it
+    login_as(clipper)
+    submission_id = client.post(f"/gigs/{gig_ids[0]}/claim").json()["submission_id"]
+    assert client.post("/gigs/submit-video", json={"gig_id": gig_ids[0], "edited_video_url": "https://example.com/v.mp4"}).status_code == 200
+    login_as(business)
+    assert client.post(f"/payments/approve-submission/{submission_id}").status_code == 200
+    assert client.post(f"/payments/payout/{submission_id}").json()["status"] == "paid"
+
+    before_expiry = _balance(login_as, business)
+
+    # Expire
+    assert expire_credits(db)["credits_expired"] == 1
+    db.expire_all()
+
+    business_balance = _balance(login_as, business)
+    active_credits = db.query(func.sum(Credit.amount)).filter(Credit.user_id == business.id, Credit.expired == False).scalar()
+    assert before_expiry["credits_balance"] == active_credits + 10.0
+    assert business_balance == {
+        "role": "business_local",
+        "credits_balance": active_credits,
+        "total_spent": db.query(func.sum(Gig.budget)).filter(Gig.business_id == business.id).scalar(),
+        "active_gigs": db.query(Gig).filter(Gig.business_id == business.id, Gig.status.in_(["pending", "claimed"])).count()
+    }
+    assert (business_balance["total_spent"], business_balance["active_gigs"]) == (160.0, 1)
+
+    clipper_balance = _balance(login_as, clipper)
+    paid = db.query(func.sum(Payout.amount)).filter(Payout.clipper_id == clipper.id, Payout.status == "paid").scalar()
+    assert clipper_balance["total_earnings"] == paid
+    assert (clipper_balance["completed_gigs"], clipper_balance["pending_approval"]) == (1, 0)
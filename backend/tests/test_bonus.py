@@ -0,0 +1,56 @@
+import itertools
+
+import pytest
+
+from app.models import Gig, Submission
+from app.services.bonus import (
+    BONUS_CAP,
+    calculate_bonus,
+    calculate_bonus_components,
+    calculate_bonuses,
+    get_bonus_breakdown,
+    recompute_submission_bonuses
+)
+
+# Values on both sides of the eligibility thresholds and every tier bound
+VIEWS = [0, 299, 300, 499, 500, 501, 1999, 2000, 2001, 10000]
+LIKES = [0, 29, 30, 49, 50, 51, 199, 200, 201, 5000]
+OUTCOMES = [0, 1, 10, 1000]
+GRID = list(itertools.product(VIEWS, LIKES, OUTCOMES))
+
+def test_batch_bonuses_match_the_scalar_engine():
+    views, likes, outcomes = zip(*GRID)
+
+    bonuses = calculate_bonuses(views, likes, outcomes)
+
+    assert bonuses.tolist() == pytest.approx([calculate_bonus(*row) for row in GRID])
+
+def test_batch_components_match_the_scalar_breakdown():
+    views, likes, outcomes = zip(*GRID)
+    components = calculate_bonus_components(views, likes, outcomes)
+
+    for i, row in enumerate(GRID):
+        breakdown = get_bonus_breakdown(*row)
+        for name in ("views_bonus", "likes_bonus", "engagement_bonus", "outcomes_bonus", "total_before_cap", "final_bonus"):
+            assert components[name][i] == pytest.approx(breakdown[name]), (name, row)
+        assert bool(components["cap_applied"][i]) == breakdown["cap_applied"]
+
+def test_thresholds_and_cap():
+    assert calculate_bonus(299, 1000, 1000) == 0.0
+    assert calculate_bonus(1000, 29, 1000) == 0.0
+    assert calculate_bonus(100000, 10000, 0) == BONUS_CAP
+
+def test_recompute_stores_the_scalar_result(db, business, clipper):
+    gigs = [Gig(business_id=business.id, budget=50.0, goals="1k views", story_type="demo") for _ in GRID[:40]]
+    db.add_all(gigs)
+    db.flush()
+    db.add_all(
+        Submission(gig_id=gig.id, clipper_id=clipper.id, views=views, likes=likes, outcomes=outcomes, bonus=-1.0)
+        for gig, (views, likes, outcomes) in zip(gigs, GRID)
+    )
+    db.commit()
+
+    assert recompute_submission_bonuses(db, batch_size=7) == 40
+
+    for submission in db.query(Submission):
+        assert submission.bonus == pytest.approx(calculate_bonus(submission.views, submission.likes, submission.outcomes))
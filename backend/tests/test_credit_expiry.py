@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from app.models import Credit
+from app.services.credit_expiry import CreditExpirySweeper, expire_credits
+from app.services.credits import get_credit_totals, issue_credit
+
+def _issue_credits(db, user, amounts, expired_days_ago=None):
+    credits = [issue_credit(db, user.id, amount, "gig_post") for amount in amounts]
+    if expired_days_ago is not None:
+        for credit in credits:
+            credit.expiry = datetime.utcnow() - timedelta(days=expired_days_ago)
+    db.commit()
+    return credits
+
+def test_expire_credits_counts_batches_and_amounts(db, business, clipper):
+    _issue_credits(db, business, [5.0] * 5, expired_days_ago=1)
+    _issue_credits(db, business, [7.0])  # not yet due
+    _issue_credits(db, clipper, [2.5, 2.5], expired_days_ago=3)
+
+    result = expire_credits(db, batch_size=3)
+
+    assert result == {"batches": 3, "credits_expired": 7, "amount_expired": 30.0}
+    assert db.query(Credit).filter(Credit.expired == True).count() == 7
+    db.expire_all()
+    assert get_credit_totals(db, business.id) == (7.0, 25.0)
+    assert get_credit_totals(db, clipper.id) == (0.0, 5.0)
+
+def test_second_sweep_expires_nothing(db, business):
+    _issue_credits(db, business, [5.0, 5.0], expired_days_ago=1)
+    expire_credits(db)
+
+    assert expire_credits(db) == {"batches": 0, "credits_expired": 0, "amount_expired": 0.0}
+    db.expire_all()
+    assert get_credit_totals(db, business.id) == (0.0, 10.0)
+
+def test_sweeper_accumulates_counters(db, business):
+    _issue_credits(db, business, [5.0, 5.0, 5.0], expired_days_ago=1)
+    sweeper = CreditExpirySweeper(interval=0, batch_size=2)
+
+    assert sweeper.sweep()["credits_expired"] == 3
+    assert sweeper.sweep()["credits_expired"] == 0
+
+    stats = sweeper.stats()
+    assert (stats["runs"], stats["batches"], stats["credits_expired"], stats["amount_expired"]) == (2, 2, 3, 15.0)
+    assert stats["errors"] == stats["skipped"] == 0
@@ -0,0 +1,51 @@
+from app.models import Gig, Submission
+from app.routers.dashboard import load_dashboard_data
+from app.services.credits import issue_credit
+from app.services.rollups import rebuild_rollups
+
+MAX_DASHBOARD_QUERIES = 3
+
+def _post_gigs(db, business, clipper, count):
+    for i in range(count):
+        gig = Gig(business_id=business.id, budget=100.0, goals="1k views", story_type="demo", status="claimed")
+        db.add(gig)
+        db.flush()
+        db.add(Submission(gig_id=gig.id, clipper_id=clipper.id, views=i))
+        issue_credit(db, business.id, 5.0, "gig_post")
+    db.commit()
+    rebuild_rollups(db, [business.id, clipper.id])
+    db.expire_all()
+    db.refresh(business)
+    db.refresh(clipper)
+
+def test_business_dashboard_query_count_does_not_grow_with_gigs(db, business, clipper, count_queries):
+    _post_gigs(db, business, clipper, 25)
+
+    with count_queries() as statements:
+        data = load_dashboard_data(db, business)
+
+    assert len(statements) <= MAX_DASHBOARD_QUERIES
+    assert len(data["gigs"]) == 25
+    assert len(data["submissions"]) == 25
+    assert len(data["credits"]) == 25
+    assert data["total_credits"] == 125.0
+
+def test_clipper_dashboard_query_count_does_not_grow_with_submissions(db, business, clipper, count_queries):
+    _post_gigs(db, business, clipper, 25)
+
+    with count_queries() as statements:
+        data = load_dashboard_data(db, clipper)
+
+    assert len(statements) <= MAX_DASHBOARD_QUERIES
+    assert len(data["gigs"]) == 25
+    assert len(data["submissions"]) == 25
+
+def test_business_dashboard_includes_gigs_without_submissions(db, business):
+    db.add(Gig(business_id=business.id, budget=60.0, goals="100 likes", story_type="demo"))
+    db.commit()
+    rebuild_rollups(db)
+
+    data = load_dashboard_data(db, business)
+
+    assert len(data["gigs"]) == 1
+    assert data["submissions"] == []
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from app.services.email import EmailDispatcher, EmailMessage, LocalTransport
+
+def _message(subject):
+    return EmailMessage(["user@example.com"], subject, "<p>hi</p>")
+
+def test_enqueue_from_another_thread_is_delivered_by_the_loop_workers():
+    transport = LocalTransport()
+    dispatcher = EmailDispatcher(transport, workers=2)
+
+    async def scenario():
+        dispatcher.start()
+        thread = threading.Thread(target=dispatcher.enqueue, args=(_message("from a thread"),))
+        thread.start()
+        await asyncio.to_thread(thread.join)
+        dispatcher.enqueue(_message("from the loop"))
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+
+    assert sorted(message.subject for message in transport.outbox) == ["from a thread", "from the loop"]
+    assert dispatcher.stats()["queued"] == 2
+
+def test_enqueue_without_a_running_dispatcher_delivers_inline():
+    transport = LocalTransport()
+    dispatcher = EmailDispatcher(transport)
+
+    assert dispatcher.enqueue(_message("from manage.py"))
+
+    assert [message.subject for message in transport.outbox] == ["from manage.py"]
+    assert dispatcher.stats()["sent"] == 1
@@ -0,0 +1,153 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Gig, Submission, User
+from app.routers.gigs import claim_gig_for_clipper
+
+client = TestClient(app)
+
+@pytest.fixture
+def marketplace(db, business):
+    """Seven pending gigs, three of them posted in the same instant, plus one claimed gig"""
+    posted = datetime(2026, 10, 1, 12, 0, 0)
+    gigs = [
+        Gig(business_id=business.id, budget=50.0, goals="1k views", story_type="demo", created_at=posted),
+        Gig(business_id=business.id, budget=80.0, goals="1k views", story_type="demo", created_at=posted),
+        Gig(business_id=business.id, budget=120.0, goals="10 check-ins", story_type="unboxing", created_at=posted),
+        Gig(business_id=business.id, budget=55.0, goals="10 check-ins", story_type="closing",
+            created_at=posted - timedelta(hours=1)),
+        Gig(business_id=business.id, budget=200.0, goals="1k views", story_type="unboxing",
+            created_at=posted + timedelta(hours=1)),
+        Gig(business_id=business.id, budget=60.0, goals="1k views", story_type="demo",
+            created_at=posted - timedelta(days=1)),
+        Gig(business_id=business.id, budget=90.0, goals="10 check-ins", story_type="demo",
+            created_at=posted + timedelta(days=1)),
+        Gig(business_id=business.id, budget=70.0, goals="1k views", story_type="demo", status="claimed",
+            created_at=posted),
+    ]
+    db.add_all(gigs)
+    db.commit()
+    return [gig.id for gig in gigs]
+
+def _available(**params):
+    return client.get("/gigs/available", params=params)
+
+def _ids(response):
+    return [gig["id"] for gig in response.json()]
+
+def test_pages_cover_every_pending_gig_once_across_created_at_ties(clipper, marketplace, login_as):
+    login_as(clipper)
+    pages, cursor = [], None
+
+    while True:
+        response = _available(limit=2, **({"cursor": cursor} if cursor else {}))
+        assert response.status_code == 200
+        pages.append(_ids(response))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    seen = [gig_id for page in pages for gig_id in page]
+    expected = _ids(_available(limit=100))
+    assert seen == expected
+    assert len(seen) == len(set(seen)) == 7
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+def test_last_page_has_no_next_cursor(clipper, marketplace, login_as):
+    login_as(clipper)
+
+    first = _available(limit=4)
+    last = _available(limit=4, cursor=first.headers["X-Next-Cursor"])
+
+    assert len(first.json()) == 4
+    assert len(last.json()) == 3
+    assert "X-Next-Cursor" not in last.headers
+    assert "X-Next-Cursor" not in _available(limit=7).headers
+
+@pytest.mark.parametrize("params, expected", [
+    ({"story_type": "unboxing"}, {2, 4}),
+    ({"goals": "10 check-ins"}, {2, 3, 6}),
+    ({"min_budget": 90}, {2, 4, 6}),
+    ({"max_budget": 60}, {0, 3, 5}),
+    ({"story_type": "demo", "min_budget": 60, "max_budget": 90}, {1, 5, 6}),
+])
+def test_filters(clipper, marketplace, login_as, params, expected):
+    login_as(clipper)
+
+    response = _available(**params)
+
+    assert response.status_code == 200
+    assert set(_ids(response)) == {marketplace[index] for index in expected}
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"2026-10-01T12:00:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|3").decode(),
+    base64.urlsafe_b64encode(b"2026-10-01T12:00:00|three").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_invalid_cursor_is_rejected(clipper, marketplace, login_as, cursor):
+    login_as(clipper)
+
+    response = _available(cursor=cursor)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+@pytest.fixture
+def gig(db, business):
+    gig = Gig(business_id=business.id, budget=50.0, goals="1k views", story_type="demo")
+    db.add(gig)
+    db.commit()
+    return gig
+
+def test_claiming_moves_the_gig_to_claimed(db, clipper, gig, login_as):
+    login_as(clipper)
+
+    response = client.post(f"/gigs/{gig.id}/claim")
+
+    assert response.status_code == 200
+    submission = db.get(Submission, response.json()["submission_id"])
+    assert (submission.gig_id, submission.clipper_id) == (gig.id, clipper.id)
+    db.refresh(gig)
+    assert gig.status == "claimed"
+
+def test_a_claimed_gig_cannot_be_claimed_again(db, clipper, gig, login_as):
+    rival = User(email="rival@example.com", hashed_password="x", role="clipper")
+    db.add(rival)
+    db.commit()
+    claim_gig_for_clipper(db, gig.id, clipper.id)
+    login_as(rival)
+
+    response = client.post(f"/gigs/{gig.id}/claim")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Gig is not available for claiming"
+    assert db.query(Submission).filter_by(gig_id=gig.id).count() == 1
+
+def test_duplicate_claim_by_one_clipper_is_a_400(db, clipper, gig, login_as):
+    claim_gig_for_clipper(db, gig.id, clipper.id)
+    # Reopened gig: the conditional update succeeds, the unique constraint does not
+    gig.status = "pending"
+    db.commit()
+    login_as(clipper)
+
+    response = client.post(f"/gigs/{gig.id}/claim")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "You have already claimed this gig"
+    db.expire_all()
+    assert db.get(Gig, gig.id).status == "pending"
+    assert db.query(Submission).filter_by(gig_id=gig.id).count() == 1
+
+def test_claiming_a_missing_gig_is_a_404(db, clipper, login_as):
+    login_as(clipper)
+
+    response = client.post("/gigs/999/claim")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Gig not found"
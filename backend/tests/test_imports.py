@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+# Imported on first use by the code paths that need them
+LAZY_MODULES = ("numpy", "PIL", "boto3", "stripe", "redis", "alembic")
+
+def test_api_startup_does_not_import_heavy_modules():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, app.main; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
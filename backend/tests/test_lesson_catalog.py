@@ -0,0 +1,30 @@
+from app.models import Lesson
+from app.services.lesson_catalog import SAMPLE_LESSONS, LessonCatalog, seed_lessons
+
+def test_reading_an_empty_catalog_does_not_seed(db):
+    catalog = LessonCatalog()
+
+    assert catalog.get(db).lessons == ()
+    assert db.query(Lesson).count() == 0
+
+def test_seed_lessons_autogenerates_ids_once(db):
+    assert seed_lessons(db) == len(SAMPLE_LESSONS)
+    assert seed_lessons(db) == 0
+    # Ids come from the table's sequence, so later inserts don't collide
+    db.add(Lesson(title="Another", content="", quiz={"questions": []}))
+    db.commit()
+    assert db.query(Lesson).count() == len(SAMPLE_LESSONS) + 1
+
+def test_catalog_reloads_after_ttl(db, monkeypatch):
+    seed_lessons(db)
+    catalog = LessonCatalog(ttl=60)
+    snapshot = catalog.get(db)
+
+    # Commits only invalidate the process-wide catalog, as with another worker's change
+    db.add(Lesson(title="New lesson", content="", quiz={"questions": []}))
+    db.commit()
+    assert catalog.get(db) is snapshot
+
+    now = snapshot.loaded_at + 61
+    monkeypatch.setattr("app.services.lesson_catalog.time.monotonic", lambda: now)
+    assert len(catalog.get(db).lessons) == len(SAMPLE_LESSONS) + 1
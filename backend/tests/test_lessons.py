@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.database import engine
+from app.main import app
+from app.models import Lesson
+from app.services.lesson_catalog import SAMPLE_LESSONS, lesson_catalog, seed_lessons
+
+client = TestClient(app)
+
+@pytest.fixture
+def lessons(db, clipper, login_as):
+    """Sample lessons, read by a logged-in clipper through a fresh catalog"""
+    lesson_catalog.invalidate()
+    seed_lessons(db)
+    login_as(clipper)
+    yield [lesson.id for lesson in db.query(Lesson).order_by(Lesson.id)]
+    lesson_catalog.invalidate()
+
+def test_matching_etag_gets_304_without_a_body(lessons):
+    etag = client.get("/lessons/").headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}'):
+        response = client.get("/lessons/", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    assert client.get("/lessons/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+def test_gzip_is_served_to_clients_that_accept_it(db, lessons):
+    response = client.get("/lessons/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert [lesson["title"] for lesson in response.json()] == [lesson["title"] for lesson in SAMPLE_LESSONS]
+
+    plain = client.get("/lessons/", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    assert plain.json() == response.json()
+    assert gzip.decompress(lesson_catalog.get(db).gzip_body) == plain.content
+
+def test_etag_changes_when_a_lesson_is_edited(db, lessons):
+    etag = client.get("/lessons/").headers["ETag"]
+
+    db.get(Lesson, lessons[0]).title = "Creating Compelling Hooks"
+    db.commit()
+
+    response = client.get("/lessons/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_etag_changes_after_the_ttl_refresh(db, lessons, monkeypatch):
+    snapshot = lesson_catalog.get(db)
+    etag = client.get("/lessons/").headers["ETag"]
+    # Written outside the ORM session, as by another worker: only the TTL picks it up
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO lessons (title, content, quiz) VALUES ('New lesson', '', :quiz)"),
+            {"quiz": json.dumps({"questions": []})}
+        )
+
+    assert client.get("/lessons/", headers={"If-None-Match": etag}).status_code == 304
+
+    now = snapshot.loaded_at + lesson_catalog.ttl + 1
+    monkeypatch.setattr("app.services.lesson_catalog.time.monotonic", lambda: now)
+    response = client.get("/lessons/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[-1]["title"] == "New lesson"
+
+def _grade_batch(attempts):
+    response = client.post("/lessons/grade-batch", json=attempts)
+    assert response.status_code == 200
+    return response.json()
+
+def test_batch_grades_correct_and_incorrect_answers(lessons):
+    first, second = lessons
+
+    body = _grade_batch([
+        {"lesson_id": first, "answers": [1, 1, 2], "reference": "all-right"},
+        {"lesson_id": second, "answers": [1, 2, 0], "reference": "two-right"},
+        {"lesson_id": first, "answers": [0, 0, 0], "reference": "all-wrong"},
+        {"lesson_id": second, "answers": [1, 2, 1]},
+    ])
+
+    assert body["rejected"] == []
+    assert [
+        (result["attempt"], result["reference"], result["lesson_id"], result["correct_answers"], result["passed"])
+        for result in body["results"]
+    ] == [
+        (0, "all-right", first, 3, True),
+        (1, "two-right", second, 2, False),
+        (2, "all-wrong", first, 0, False),
+        (3, None, second, 3, True),
+    ]
+    assert [result["score"] for result in body["results"]] == pytest.approx([100.0, 200 / 3, 0.0, 100.0])
+    assert {result["total_questions"] for result in body["results"]} == {3}
+
+def test_batch_rejects_unknown_lessons_and_wrong_answer_counts(lessons):
+    first, _ = lessons
+
+    body = _grade_batch([
+        {"lesson_id": 999, "answers": [1, 1, 2], "reference": "missing"},
+        {"lesson_id": first, "answers": [1, 1, 2]},
+        {"lesson_id": first, "answers": [1, 1], "reference": "short"},
+    ])
+
+    assert [(result["attempt"], result["correct_answers"]) for result in body["results"]] == [(1, 3)]
+    assert body["rejected"] == [
+        {"attempt": 0, "reference": "missing", "reason": "Lesson not found"},
+        {"attempt": 2, "reference": "short", "reason": "Number of answers doesn't match number of questions"},
+    ]
+
+def test_empty_batch(lessons):
+    assert _grade_batch([]) == {"results": [], "rejected": []}
@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+
+from app import main
+
+client = TestClient(main.app)
+
+def test_metrics_is_disabled_without_a_token(monkeypatch):
+    monkeypatch.setattr(main.settings, "metrics_token", "")
+
+    assert client.get("/metrics").status_code == 404
+
+def test_metrics_requires_the_configured_token(monkeypatch):
+    monkeypatch.setattr(main.settings, "metrics_token", "s3cret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.json()["db_pool"]["sync"]["pool"]
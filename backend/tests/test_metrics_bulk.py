@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Gig, Submission, User
+from app.routers import gigs as gigs_router
+from app.services.bonus import calculate_bonus
+
+client = TestClient(app)
+
+@pytest.fixture
+def submissions(db, business, clipper):
+    gigs = [Gig(business_id=business.id, budget=50.0, goals="1k views", story_type="demo") for _ in range(3)]
+    db.add_all(gigs)
+    db.flush()
+    rows = [Submission(gig_id=gig.id, clipper_id=clipper.id) for gig in gigs]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+def _ndjson(*records):
+    return "\n".join(record if isinstance(record, str) else json.dumps(record) for record in records).encode()
+
+def test_ndjson_stream_is_applied_in_batches(db, clipper, submissions, login_as, monkeypatch):
+    monkeypatch.setattr(gigs_router.settings, "metrics_batch_size", 2)
+    login_as(clipper)
+    first, second, third = submissions
+
+    response = client.post(
+        "/gigs/submissions/metrics/bulk",
+        content=_ndjson(
+            {"submission_id": first, "views": 400, "likes": 40},
+            "{not json",
+            {"submission_id": second, "views": 2500, "likes": 250, "outcomes": 3},
+            "",
+            {"submission_id": 999999, "views": 1},
+            {"submission_id": first, "outcomes": 7},
+            {"submission_id": third, "likes": 5}
+        ),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 4  # first is written by two batches
+    assert [r.get("record", r.get("submission_id")) for r in body["rejected"]] == [1, 999999]
+
+    db.expire_all()
+    stored = {row.id: row for row in db.query(Submission)}
+    assert (stored[first].views, stored[first].likes, stored[first].outcomes) == (400, 40, 7)
+    assert stored[second].bonus == pytest.approx(calculate_bonus(2500, 250, 3))
+    assert stored[third].likes == 5 and stored[third].bonus == 0.0
+
+def test_later_records_for_a_submission_override_earlier_ones(db, clipper, submissions, login_as):
+    login_as(clipper)
+
+    response = client.post(
+        "/gigs/submissions/metrics/bulk",
+        json=[
+            {"submission_id": submissions[0], "views": 100, "likes": 10},
+            {"submission_id": submissions[0], "views": 900}
+        ]
+    )
+
+    assert response.json() == {"updated": 1, "rejected": []}
+    db.expire_all()
+    row = db.get(Submission, submissions[0])
+    assert (row.views, row.likes) == (900, 10)
+
+def test_records_for_other_users_submissions_are_rejected(db, submissions, login_as):
+    other = User(email="other@example.com", hashed_password="x", role="clipper")
+    db.add(other)
+    db.commit()
+    login_as(other)
+
+    response = client.post("/gigs/submissions/metrics/bulk", json=[{"submission_id": submissions[0], "views": 5}])
+
+    assert response.json()["updated"] == 0
+    assert response.json()["rejected"][0]["reason"] == "You can only update your own submissions"
+
+def test_body_that_is_not_an_array_is_a_bad_request(clipper, login_as):
+    login_as(clipper)
+
+    response = client.post("/gigs/submissions/metrics/bulk", json={"submission_id": 1})
+
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+from argparse import Namespace
+from datetime import datetime, timedelta
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import text
+
+from app.database import Base, SessionLocal, engine
+from app.manage import init_db
+from app.models import StoryTypeRollup, UserRollup
+from app.services.rollups import USER_ROLLUP_COLUMNS, _compute_rollups
+
+@pytest.fixture
+def empty_database():
+    """The test database without any tables; dropped again afterwards"""
+    Base.metadata.drop_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+def _schema_diff():
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection, opts={"compare_type": True}), Base.metadata)
+
+def test_migrations_match_the_models(empty_database):
+    init_db(Namespace(revision="head"))
+
+    assert _schema_diff() == []
+
+def test_legacy_database_is_upgraded_and_rollups_backfilled(empty_database):
+    # A database created by the old create_all-based init-db: baseline tables, no version table
+    init_db(Namespace(revision="0001"))
+    expiry = datetime.utcnow() + timedelta(days=180)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text(
+            "INSERT INTO users (id, email, hashed_password, role, is_active) VALUES "
+            "(1, 'shop@example.com', 'x', 'business_local', 1), (2, 'clipper@example.com', 'x', 'clipper', 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO gigs (id, business_id, budget, goals, story_type, status) VALUES "
+            "(1, 1, 100, '1k views', 'demo', 'completed'), (2, 1, 60, '1k views', 'demo', 'claimed'), "
+            "(3, 1, 80, '1k views', 'unboxing', 'pending')"
+        ))
+        connection.execute(text(
+            "INSERT INTO submissions (gig_id, clipper_id, views, likes, outcomes) VALUES "
+            "(1, 2, 1200, 90, 3), (2, 2, 400, 10, 0)"
+        ))
+        connection.execute(
+            text("INSERT INTO credits (user_id, amount, source, expiry) VALUES (1, 5, 'gig_post', :e), (1, 10, 'self-promo', :e)"),
+            {"e": expiry}
+        )
+
+    init_db(Namespace(revision="head"))
+
+    assert _schema_diff() == []
+    db = SessionLocal()
+    try:
+        users, stories = _compute_rollups(db)
+        stored_users = {
+            rollup.user_id: {column: getattr(rollup, column) for column in USER_ROLLUP_COLUMNS}
+            for rollup in db.query(UserRollup)
+        }
+        assert stored_users[1] == {column: users[1].get(column, 0) for column in USER_ROLLUP_COLUMNS}
+        assert stored_users[1]["credits_issued"] == 15.0
+        assert not any(stored_users[2].values())
+        stored_stories = {(r.business_id, r.story_type): (r.gigs_count, r.total_spent, r.total_views) for r in db.query(StoryTypeRollup)}
+        assert stored_stories == {
+            key: (values["gigs_count"], values["total_spent"], values["total_views"]) for key, values in stories.items()
+        }
+    finally:
+        db.close()
@@ -0,0 +1,67 @@
+import pytest
+
+from app.models import Gig, Payout, Submission
+from app.services.payouts import MockPayoutProvider, PayoutRejected, run_payouts
+
+class ScriptedProvider(MockPayoutProvider):
+    """Raises the scripted errors in order, then pays; records the keys it was sent"""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.keys = []
+
+    def create_payout(self, amount_cents, idempotency_key, metadata):
+        self.keys.append(idempotency_key)
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().create_payout(amount_cents, idempotency_key, metadata)
+
+@pytest.fixture
+def submission(db, business, clipper):
+    gig = Gig(business_id=business.id, budget=100.0, goals="1k views", story_type="demo", status="completed")
+    db.add(gig)
+    db.flush()
+    submission = Submission(gig_id=gig.id, clipper_id=clipper.id, approved=True, bonus=20.0)
+    db.add(submission)
+    db.commit()
+    return submission
+
+def _payout(db, submission):
+    db.expire_all()
+    return db.query(Payout).filter(Payout.submission_id == submission.id).one()
+
+def test_unknown_outcome_stays_pending_and_reuses_the_key(db, submission):
+    provider = ScriptedProvider([TimeoutError("read timed out")])
+
+    result = run_payouts(db, provider=provider)
+    assert (result["succeeded"], result["failed"], result["pending"]) == (0, 0, 1)
+    assert _payout(db, submission).status == "pending"
+
+    run_payouts(db, provider=provider)
+    payout = _payout(db, submission)
+    assert payout.status == "paid"
+    assert provider.keys == [f"payout-submission-{submission.id}"] * 2
+
+def test_rejected_payout_is_retried_under_a_new_key(db, submission):
+    provider = ScriptedProvider([PayoutRejected("insufficient funds"), PayoutRejected("insufficient funds")])
+
+    assert run_payouts(db, provider=provider)["failed"] == 1
+    assert _payout(db, submission).status == "failed"
+    run_payouts(db, provider=provider)
+    run_payouts(db, provider=provider)
+
+    payout = _payout(db, submission)
+    assert (payout.status, payout.attempts) == ("paid", 3)
+    assert provider.keys == [
+        f"payout-submission-{submission.id}",
+        f"payout-submission-{submission.id}-1",
+        f"payout-submission-{submission.id}-2"
+    ]
+
+def test_paid_submissions_are_not_sent_again(db, submission):
+    provider = ScriptedProvider([])
+    run_payouts(db, provider=provider)
+
+    assert run_payouts(db, provider=provider)["processed"] == 0
+    assert len(provider.keys) == 1
@@ -0,0 +1,128 @@
+import asyncio
+import ipaddress
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import main, middleware
+from app.middleware import RateLimiter, RateLimitRule, client_ip, limiter
+
+PROXIES = [ipaddress.ip_network("10.0.0.0/8")]
+
+def _request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 50000), "headers": headers})
+
+def test_forwarded_header_is_ignored_without_trusted_proxies():
+    assert client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+def test_forwarded_header_is_ignored_from_untrusted_peers():
+    assert client_ip(_request("203.0.113.7", "198.51.100.1"), PROXIES) == "203.0.113.7"
+
+def test_client_is_the_rightmost_untrusted_forwarded_address():
+    # A client-supplied (spoofed) entry sits left of the address our proxy saw
+    request = _request("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.5")
+
+    assert client_ip(request, PROXIES) == "198.51.100.1"
+
+def test_all_trusted_chain_falls_back_to_the_leftmost_address():
+    assert client_ip(_request("10.0.0.2", "10.0.0.9, 10.0.0.5"), PROXIES) == "10.0.0.9"
+
+def test_rate_limited_responses_carry_cors_headers(monkeypatch):
+    monkeypatch.setattr(limiter, "hit", lambda rule, key: (False, 5.0))
+
+    response = TestClient(main.app).get("/", headers={"Origin": "http://localhost:3000"})
+
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+
+class FakeClock:
+    """Stands in for the time module inside app.middleware"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(middleware, "time", fake)
+    return fake
+
+def test_bucket_rejects_when_empty_and_refills_over_time(clock):
+    rule = RateLimitRule("test", 2, 10)
+    local = RateLimiter([], rule, use_redis=False)
+
+    assert local.hit(rule, "a") == (True, 0.0)
+    assert local.hit(rule, "a") == (True, 0.0)
+    assert local.hit(rule, "a") == (False, pytest.approx(5.0))
+    assert local.hit(rule, "b") == (True, 0.0)  # buckets are per client
+
+    clock.now += 2.5
+    assert local.hit(rule, "a") == (False, pytest.approx(2.5))
+    clock.now += 2.5
+    assert local.hit(rule, "a") == (True, 0.0)
+    assert local.hit(rule, "a")[0] is False
+
+def test_exhausted_limit_gets_429_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(limiter, "default", RateLimitRule("default", 2, 60))
+    client = TestClient(main.app)
+
+    assert [client.get("/").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert response.headers["X-RateLimit-Limit"] == "2"
+
+    clock.now += 30
+    assert client.get("/").status_code == 200
+
+@pytest.mark.parametrize("method, path, rule", [
+    ("POST", "/token", "login"),
+    ("POST", "/signup", "signup"),
+    ("POST", "/gigs/upload-raw-footage", "uploads"),
+    ("POST", "/payments/webhook", "webhooks"),
+    ("GET", "/token", "default"),
+    ("POST", "/gigs/post-gig", "default"),
+    ("GET", "/gigs/available", "default"),
+])
+def test_rules_match_by_method_and_path_prefix(method, path, rule):
+    assert limiter.rule_for(method, path).name == rule
+
+def test_login_limit_is_separate_from_the_default(db, clock, monkeypatch):
+    monkeypatch.setattr(limiter, "rules", [("POST", "/token", RateLimitRule("login", 1, 60))])
+    client = TestClient(main.app)
+
+    assert client.post("/token", data={"username": "x", "password": "y"}).status_code != 429
+    assert client.post("/token", data={"username": "x", "password": "y"}).status_code == 429
+    assert client.get("/").status_code == 200
+
+def test_idle_buckets_are_evicted_without_redis(clock):
+    rule = RateLimitRule("test", 5, 60)
+    local = RateLimiter([], rule, use_redis=False, sync_interval=0.01)
+    local.hit(rule, "idle")
+    local.sync()  # clears the pending count; the bucket is still fresh
+    clock.now += 30
+    local.hit(rule, "busy")
+    clock.now += 31
+
+    async def run():
+        local.start()
+        await asyncio.sleep(0.1)
+        await local.stop()
+
+    asyncio.run(run())
+
+    assert list(local._buckets) == [("test", "busy")]
+    assert local.stats()["evicted"] == 1
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from app.models import Gig, Submission, StoryTypeRollup, UserRollup
+from app.routers.gigs import apply_metrics_batch, claim_gig_for_clipper, post_gig, submit_video
+from app.schemas import GigCreate, SubmissionCreate, SubmissionMetricsRecord
+from app.services.credit_expiry import expire_credits
+from app.services.rollups import USER_ROLLUP_COLUMNS, _compute_rollups, get_user_rollup, rebuild_rollups
+
+STORY_COLUMNS = ("gigs_count", "total_spent", "total_views", "total_likes", "total_outcomes")
+
+def _stored_rollups(db):
+    """Stored rollup values, leaving out all-zero user rows (users without activity)"""
+    db.expire_all()
+    users = {
+        rollup.user_id: {column: getattr(rollup, column) for column in USER_ROLLUP_COLUMNS}
+        for rollup in db.query(UserRollup)
+    }
+    users = {user_id: values for user_id, values in users.items() if any(values.values())}
+    stories = {
+        (rollup.business_id, rollup.story_type): {column: getattr(rollup, column) for column in STORY_COLUMNS}
+        for rollup in db.query(StoryTypeRollup)
+    }
+    return users, stories
+
+def _recomputed_rollups(db):
+    users, stories = _compute_rollups(db)
+    return (
+        {user_id: {column: values.get(column, 0) for column in USER_ROLLUP_COLUMNS} for user_id, values in users.items()},
+        {key: {column: values.get(column, 0) for column in STORY_COLUMNS} for key, values in stories.items()}
+    )
+
+def _run_activity(db, business, clipper):
+    gigs = [
+        post_gig(GigCreate(budget=budget, goals="1k views", story_type=story_type), db, business)
+        for budget, story_type in ((100.0, "demo"), (150.0, "demo"), (80.0, "unboxing"))
+    ]
+    submission_ids = [claim_gig_for_clipper(db, gig.id, clipper.id)[0] for gig in gigs[:2]]
+    submit_video(SubmissionCreate(gig_id=gigs[0].id, edited_video_url="https://v/1", social_post_link="https://p/1"), db, clipper)
+
+    apply_metrics_batch(db, [
+        SubmissionMetricsRecord(submission_id=submission_ids[0], views=1200, likes=90, outcomes=3),
+        SubmissionMetricsRecord(submission_id=submission_ids[1], views=400, likes=10)
+    ], business.id, business.role)
+    apply_metrics_batch(db, [SubmissionMetricsRecord(submission_id=submission_ids[0], views=900)], business.id, business.role)
+
+    expire_credits(db, batch_size=2, now=datetime.utcnow() + timedelta(days=365))
+
+def test_incremental_rollups_match_recompute(db, business, clipper):
+    _run_activity(db, business, clipper)
+
+    assert _stored_rollups(db) == _recomputed_rollups(db)
+    assert get_user_rollup(db, business.id).gigs_completed == 1
+
+def test_writers_create_missing_rollup_rows(db, business):
+    post_gig(GigCreate(budget=100.0, goals="1k views", story_type="demo"), db, business)
+
+    rollup = db.query(UserRollup).filter(UserRollup.user_id == business.id).one()
+    assert (rollup.gigs_total, rollup.gigs_active, rollup.total_spent) == (1, 1, 100.0)
+    assert rollup.credits_issued > 0
+
+def test_get_user_rollup_does_not_write(db, business, count_queries):
+    with count_queries() as statements:
+        rollup = get_user_rollup(db, business.id)
+
+    assert rollup.gigs_total == 0 and rollup.credits_issued == 0
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert db.query(UserRollup).count() == 0
+
+def test_rebuild_repairs_drifted_rollups(db, business, clipper):
+    _run_activity(db, business, clipper)
+    expected = _stored_rollups(db)
+    db.query(UserRollup).update({UserRollup.total_views: 0, UserRollup.gigs_total: 99})
+    db.query(StoryTypeRollup).delete()
+    db.add(Gig(business_id=business.id, budget=60.0, goals="100 likes", story_type="demo", status="completed"))
+    db.commit()
+
+    assert rebuild_rollups(db) == 2
+
+    users, stories = _stored_rollups(db)
+    assert (users, stories) == _recomputed_rollups(db)
+    assert users[business.id]["total_views"] == expected[0][business.id]["total_views"]
+    assert users[business.id]["gigs_total"] == 4
+    assert stories[(business.id, "demo")]["gigs_count"] == 3
@@ -0,0 +1,48 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app.models import StoredFile
+from app.services import thumbnails
+from app.services.storage import storage
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    yield
+    thumbnails._thumbnail_cache.clear()
+
+def _store(db, key, data):
+    storage.put(key, data, "video/mp4")
+    content_hash = "ab" * 32
+    db.add(StoredFile(
+        folder="raw-footage",
+        content_hash=content_hash,
+        key=key,
+        url=storage.url_for(key),
+        size=len(data),
+        content_type="video/mp4"
+    ))
+    db.commit()
+    return content_hash
+
+def test_undecodable_video_gets_placeholders_that_are_not_persisted(db):
+    content_hash = _store(db, "raw-footage/broken.mp4", b"not a video")
+
+    urls = asyncio.run(thumbnails.get_thumbnails(storage.url_for("raw-footage/broken.mp4")))
+
+    assert urls["small"].endswith("_small_placeholder.jpg")
+    db.expire_all()
+    assert db.query(StoredFile).filter_by(content_hash=content_hash).one().thumbnail_urls is None
+
+def test_decodable_source_is_rendered_and_persisted(db):
+    frame = io.BytesIO()
+    Image.new("RGB", (64, 64), (10, 200, 30)).save(frame, format="GIF")
+    content_hash = _store(db, "raw-footage/frame.gif", frame.getvalue())
+
+    urls = asyncio.run(thumbnails.get_thumbnails(storage.url_for("raw-footage/frame.gif")))
+
+    assert urls["small"].endswith("_small.jpg")
+    db.expire_all()
+    assert db.query(StoredFile).filter_by(content_hash=content_hash).one().thumbnail_urls == urls
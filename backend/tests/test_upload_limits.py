@@ -0,0 +1,55 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.middleware import UploadSizeLimitMiddleware
+
+LIMIT = 1024
+
+def _client():
+    app = FastAPI()
+    received = []
+
+    @app.post("/gigs/upload-raw-footage")
+    async def upload(file: UploadFile = File(...)):
+        received.append(len(await file.read()))
+        return {"size": received[-1]}
+
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_size=LIMIT, path_prefixes=["/gigs/upload-"])
+    return TestClient(app), received
+
+def test_upload_within_limit_reaches_the_handler():
+    client, received = _client()
+
+    response = client.post("/gigs/upload-raw-footage", files={"file": ("clip.mp4", b"x" * 512, "video/mp4")})
+
+    assert response.status_code == 200
+    assert received == [512]
+
+def test_declared_content_length_over_limit_is_rejected_before_the_body_is_read():
+    client, received = _client()
+
+    response = client.post("/gigs/upload-raw-footage", files={"file": ("clip.mp4", b"x" * 4096, "video/mp4")})
+
+    assert response.status_code == 413
+    assert received == []
+
+def test_streamed_body_is_cut_off_once_it_passes_the_limit():
+    client, received = _client()
+    body = (
+        b"--boundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"clip.mp4\"\r\n"
+        b"Content-Type: video/mp4\r\n\r\n" + b"x" * 4096 + b"\r\n--boundary--\r\n"
+    )
+
+    # No Content-Length: the body arrives in chunks
+    response = client.post(
+        "/gigs/upload-raw-footage",
+        content=_chunks_of(body),
+        headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+    )
+
+    assert response.status_code == 413
+    assert received == []
+
+def _chunks_of(body, size=256):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
@@ -0,0 +1,60 @@
+import asyncio
+import io
+
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers, UploadFile
+
+from app.main import app
+from app.models import StoredFile
+from app.services import thumbnails
+from app.services.file_upload import upload_video_to_s3
+from app.services.storage import LocalStorage
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 4096
+
+def _upload(content, filename="clip.mp4"):
+    return UploadFile(io.BytesIO(content), filename=filename, headers=Headers({"content-type": "video/mp4"}))
+
+def test_identical_uploads_are_stored_once_per_folder(db):
+    first = asyncio.run(upload_video_to_s3(_upload(VIDEO), "raw-footage", db))
+    repeat = asyncio.run(upload_video_to_s3(_upload(VIDEO, "renamed.mp4"), "raw-footage", db))
+    other_folder = asyncio.run(upload_video_to_s3(_upload(VIDEO), "edited-videos", db))
+
+    assert repeat == first
+    assert other_folder != first
+    assert sorted(row.folder for row in db.query(StoredFile)) == ["edited-videos", "raw-footage"]
+
+def test_concurrent_local_uploads_of_one_key_stage_separately(tmp_path):
+    storage = LocalStorage(str(tmp_path), "http://localhost/uploads")
+    (tmp_path / "raw-footage").mkdir()
+    key = "raw-footage/abc.mp4"
+
+    first = storage.start_upload(key, "video/mp4", {})
+    second = storage.start_upload(key, "video/mp4", {})
+    assert first != second
+
+    parts_first = [storage.upload_part(key, first, 1, b"same content")]
+    parts_second = [storage.upload_part(key, second, 1, b"same content")]
+    storage.complete_upload(key, first, parts_first)
+    storage.complete_upload(key, second, parts_second)
+
+    assert (tmp_path / "raw-footage" / "abc.mp4").read_bytes() == b"same content"
+    assert sorted(path.name for path in (tmp_path / "raw-footage").iterdir()) == ["abc.mp4"]
+
+def test_raw_footage_upload_returns_the_thumbnail(db, business, login_as):
+    login_as(business)
+
+    response = TestClient(app).post(
+        "/gigs/upload-raw-footage",
+        files={"file": ("clip.mp4", VIDEO, "video/mp4")}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    stored = db.query(StoredFile).one()
+    assert body["raw_footage_url"] == stored.url
+    try:
+        assert body["thumbnail_url"] == thumbnails._thumbnail_cache.get(stored.content_hash)["small"]
+        assert body["thumbnail_url"].endswith("_small_placeholder.jpg")
+    finally:
+        thumbnails._thumbnail_cache.clear()
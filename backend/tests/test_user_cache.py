@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy import update
+
+from app.auth import cache_user, user_cache
+from app.models import User
+
+def _cached(user):
+    asyncio.run(cache_user(user))
+    return user.email
+
+def test_update_invalidates_only_after_commit(db, clipper):
+    email = _cached(clipper)
+
+    clipper.role = "business_local"
+    db.flush()
+    assert user_cache.get(email) is not None
+
+    db.commit()
+    assert user_cache.get(email) is None
+
+def test_rolled_back_update_keeps_the_cache_entry(db, clipper):
+    email = _cached(clipper)
+
+    clipper.is_active = False
+    db.flush()
+    db.rollback()
+
+    assert user_cache.get(email) is not None
+    user_cache.clear()
+
+def test_email_change_drops_the_old_key(db, clipper):
+    old_email = _cached(clipper)
+    db.expire(clipper)
+
+    clipper.email = "renamed@example.com"
+    db.commit()
+
+    assert user_cache.get(old_email) is None
+
+def test_bulk_update_invalidates_matched_users(db, clipper, business):
+    clipper_email, business_email = _cached(clipper), _cached(business)
+
+    db.execute(update(User).where(User.role == "clipper").values(is_active=False))
+    db.commit()
+
+    assert user_cache.get(clipper_email) is None
+    assert user_cache.get(business_email) is not None
+    user_cache.clear()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models import WebhookEvent
+from app.services.webhooks import (
+    WebhookDispatcher,
+    claim_event,
+    fake_event,
+    release_stale_events,
+    replay_events,
+    sign_payload,
+    store_webhook_event,
+    webhook_dispatcher
+)
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Capture enqueued events instead of starting the dispatcher"""
+    events = []
+    monkeypatch.setattr(webhook_dispatcher, "enqueue", lambda event_pk, object_id: events.append(event_pk))
+    return events
+
+def _post(body: bytes, signature=None):
+    headers = {"Content-Type": "application/json"}
+    if signature:
+        headers["Stripe-Signature"] = signature
+    return client.post("/payments/webhook", content=body, headers=headers)
+
+def test_webhook_requires_a_valid_signature(db, queued):
+    body = json.dumps(fake_event()).encode()
+
+    assert _post(body).status_code == 400
+    assert _post(body, sign_payload(body, secret="whsec_other")).status_code == 400
+    assert _post(body.replace(b"usd", b"eur"), sign_payload(body)).status_code == 400
+    assert db.query(WebhookEvent).count() == 0
+    assert queued == []
+
+def test_signed_webhook_is_stored_and_queued(db, queued):
+    body = json.dumps(fake_event()).encode()
+
+    response = _post(body, sign_payload(body))
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    assert queued == [db.query(WebhookEvent.id).scalar()]
+    assert _post(body, sign_payload(body)).json()["status"] == "duplicate"
+
+def test_an_event_is_claimed_once(db):
+    event_pk, _, _ = store_webhook_event(db, fake_event())
+
+    assert claim_event(db, event_pk).status == "processing"
+    assert claim_event(db, event_pk) is None
+
+def test_later_events_for_an_object_wait_for_earlier_ones(db):
+    first, _, _ = store_webhook_event(db, fake_event("payout.paid", "po_1"))
+    second, _, _ = store_webhook_event(db, fake_event("payout.failed", "po_1"))
+    other, _, _ = store_webhook_event(db, fake_event("payout.paid", "po_2"))
+
+    assert claim_event(db, second) is None
+    assert claim_event(db, other) is not None
+    assert claim_event(db, first) is not None
+    assert claim_event(db, second) is None  # first is still processing
+
+def test_replay_defaults_include_pending_events(db):
+    store_webhook_event(db, fake_event("payout.paid", "po_1"))
+    store_webhook_event(db, fake_event("payout.failed", "po_1"))
+
+    assert replay_events(db) == {"processed": 2, "failed": 0, "skipped": 0}
+    assert {status for (status,) in db.query(WebhookEvent.status)} == {"processed"}
+
+def test_stale_processing_events_are_released(db):
+    stale, _, _ = store_webhook_event(db, fake_event())
+    fresh, _, _ = store_webhook_event(db, fake_event())
+    claim_event(db, stale)
+    claim_event(db, fresh)
+    db.query(WebhookEvent).filter(WebhookEvent.id == stale).update(
+        {WebhookEvent.claimed_at: datetime.utcnow() - timedelta(minutes=10)}
+    )
+    db.commit()
+
+    assert release_stale_events(db, timeout=300) == 1
+    db.expire_all()
+    assert db.get(WebhookEvent, stale).status == "pending"
+    assert db.get(WebhookEvent, fresh).status == "processing"
+
+def test_events_left_by_a_full_queue_are_requeued(db):
+    events = [store_webhook_event(db, fake_event("payout.paid", "po_1"))[0] for _ in range(3)]
+    dispatcher = WebhookDispatcher(workers=1, queue_size=1, poll_interval=0)
+
+    async def run():
+        dispatcher.start()
+        accepted = [dispatcher.enqueue(event_pk, "po_1") for event_pk in events]
+        await dispatcher.stop()
+        dispatcher.start()
+        while await dispatcher.requeue_pending():
+            await asyncio.gather(*(queue.join() for queue in dispatcher._queues))
+        await dispatcher.stop()
+        return accepted
+
+    assert asyncio.run(run()) == [True, False, False]
+    db.expire_all()
+    assert {status for (status,) in db.query(WebhookEvent.status)} == {"processed"}
+    stats = dispatcher.stats()
+    assert (stats["dropped"], stats["requeued"], stats["processed"]) == (3, 2, 3)